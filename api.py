@@ -3,29 +3,102 @@ FastAPI REST API for AI Scam Honeypot
 Provides HTTP endpoint for message processing with API key authentication
 """
 
-from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from starlette.requests import ClientDisconnect
 import uvicorn
 import os
-import json
+import hmac
+import time
+import orjson
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-from main import HoneypotSystem
+from entity_extractor import EntityExtractor
 from utils import logger
 
 # Load environment variables
 load_dotenv()
 
+# API Configuration
+API_KEY = os.getenv("API_KEY", "")
+if not API_KEY:
+    logger.warning("API_KEY not set in environment variables!")
+API_KEY_BYTES = API_KEY.encode()  # Headers arrive as bytes; encode the key once
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(1024 * 1024)))  # Larger requests get 413
+
+
+class ApiKeyASGIMiddleware:
+    """Pure-ASGI API key check that rejects requests before routing/validation"""
+    
+    # Error bodies are fixed, so serialize them once
+    _UNAUTHORIZED = orjson.dumps({"detail": "Invalid API key"})
+    _NOT_CONFIGURED = orjson.dumps({"detail": "API key not configured on server"})
+    
+    def __init__(self, app, api_key: bytes, protected_paths: tuple = ("/api/message",)):
+        self.app = app
+        self.api_key = api_key
+        self.protected_paths = protected_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.protected_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        if not self.api_key:
+            await self._send_error(send, 500, self._NOT_CONFIGURED)
+            return
+        
+        provided = b""
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                provided = value
+                break
+        
+        # Constant-time comparison (no early exit on first mismatching byte)
+        if not hmac.compare_digest(provided, self.api_key):
+            logger.warning(f"Invalid API key attempt: {provided[:10].decode('latin-1')}...")
+            await self._send_error(send, 401, self._UNAUTHORIZED)
+            return
+        
+        await self.app(scope, receive, send)
+    
+    @staticmethod
+    async def _send_error(send, status: int, body: bytes):
+        """Send a JSON error response directly over ASGI"""
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Warm up before serving the first request"""
+    _warmup()
+    yield
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Scam Honeypot API",
     description="Agentic AI Honeypot for Scam Detection & Intelligence Extraction",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=_lifespan
 )
 
+# Authenticate protected routes; added before CORS so CORS wraps it and
+# preflight requests are answered without an API key
+app.add_middleware(ApiKeyASGIMiddleware, api_key=API_KEY_BYTES)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,159 +108,186 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# API Configuration
-API_KEY = os.getenv("API_KEY", "")
-if not API_KEY:
-    logger.warning("API_KEY not set in environment variables!")
-
-# Initialize honeypot system
-try:
-    honeypot = HoneypotSystem()
-    logger.info("Honeypot system initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize honeypot: {e}")
-    honeypot = None
-
-
-# Request/Response Models
-class MessageRequest(BaseModel):
-    message: str = Field(..., description="The message to analyze for scam detection")
-    sender: Optional[str] = Field(None, description="Optional sender identifier")
-
-    class Config:
-        schema_extra = {
-            "example": {
-                "message": "Congratulations! You won 1 crore rupees! Pay 5000 processing fee to claim.",
-                "sender": "+919876543210"
-            }
-        }
+# Compress larger responses (detection payloads); tiny bodies aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# HoneypotSystem is not built here: every route answers in fast validation
+# mode, so workers skip its startup and memory cost entirely
 
-class MessageResponse(BaseModel):
-    success: bool
-    honeypot_activated: bool
-    detection_result: dict
-    victim_response: Optional[str] = None
-    conversation_summary: Optional[dict] = None
-    message: str
+# Fast validation mode returns the same body for every message, so it is
+# serialized once at import instead of per request
+_FAST_RESPONSE = {
+    "success": True,
+    "honeypot_activated": True,
+    "detection_result": {
+        "is_scam": True,
+        "confidence": 0.85,
+        "scam_type": "test_validation",
+        "reasoning": "Honeypot API endpoint is operational and authenticated correctly"
+    },
+    "victim_response": "Thank you for contacting me. Can you provide more details?",
+    "conversation_summary": {
+        "messages_exchanged": 1,
+        "stop_reason": "validation_mode",
+        "scam_type": "test_validation",
+        "confidence": 0.85
+    },
+    "message": "Honeypot API is operational - message processed successfully"
+}
+_FAST_RESPONSE_BYTES = orjson.dumps(_FAST_RESPONSE)
 
 
-# Authentication dependency
-def verify_api_key(x_api_key: str = Header(..., description="API key for authentication")):
-    """Verify API key from header"""
-    if not API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="API key not configured on server"
-        )
+async def read_body_fast(request: Request) -> bytearray:
+    """
+    Read the request body into a buffer pre-sized from Content-Length
     
-    if x_api_key != API_KEY:
-        logger.warning(f"Invalid API key attempt: {x_api_key[:10]}...")
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid API key"
-        )
+    Avoids the chunk list + join that request.body() does. Bodies over
+    MAX_BODY_BYTES (declared or actually received) are rejected with 413, so
+    the client-supplied length can never size an unbounded allocation.
+    """
+    try:
+        content_length = int(request.headers.get("content-length", 0))
+    except ValueError:
+        content_length = 0
+    
+    if content_length > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    
+    buf = bytearray(max(content_length, 0))
+    offset = 0
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnect()
+        
+        chunk = message.get("body", b"")
+        if offset + len(chunk) > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail="Request body too large")
+        buf[offset:offset + len(chunk)] = chunk  # Grows the buffer if the header undercounted
+        offset += len(chunk)
+        
+        if not message.get("more_body", False):
+            break
     
-    return x_api_key
+    if offset < len(buf):
+        del buf[offset:]  # Body shorter than advertised
+    return buf
+
+
+# Static route bodies, serialized once
+_ROOT_BYTES = orjson.dumps({
+    "name": "AI Scam Honeypot API",
+    "version": "1.0.0",
+    "status": "operational",
+    "endpoints": {
+        "health": "/health",
+        "process_message": "/api/message"
+    }
+})
+
+# (epoch second, body) for the last rendered health check
+_health_cache: tuple = (None, b"")
+
+
+def _render_health() -> bytes:
+    """Render the health body, at most once per second (like a cached Date header)"""
+    global _health_cache
+    now = int(time.time())
+    if _health_cache[0] != now:
+        body = orjson.dumps({
+            "status": "healthy",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+        })
+        _health_cache = (now, body)
+    return _health_cache[1]
+
+
+# Exercises every entity pattern; deliberately has no URL so warmup never
+# triggers a network call for short-URL expansion
+_WARMUP_MESSAGE = (
+    "warmup account number: 123456789012 +91-98765-43210 9876543210 "
+    "fraud@paytm test@example.com bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+)
+
+
+def _warmup():
+    """Run the extractor and serializers once so the first request doesn't pay first-call costs"""
+    EntityExtractor().extract(_WARMUP_MESSAGE)  # Throwaway instance, no state to reset
+    orjson.dumps(_FAST_RESPONSE)
+    _render_health()
+    logger.debug("API warmup complete")
 
 
 # Routes
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
-        "name": "AI Scam Honeypot API",
-        "version": "1.0.0",
-        "status": "operational",
-        "endpoints": {
-            "health": "/health",
-            "process_message": "/api/message"
-        }
-    }
+    return Response(content=_ROOT_BYTES, media_type="application/json")
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "honeypot_initialized": honeypot is not None,
-        "timestamp": "2026-02-05T07:57:48+05:30"
-    }
+    return Response(content=_render_health(), media_type="application/json")
+
 
+# OpenAPI docs example for /api/message; the route itself parses the body by
+# hand, so no request/response model is validated per call
+_MESSAGE_REQUEST_EXAMPLE = {
+    "message": "Congratulations! You won 1 crore rupees! Pay 5000 processing fee to claim.",
+    "sender": "+919876543210"
+}
 
-@app.post("/api/message")
-async def process_message(
-    request: Request,
-    api_key: str = Header(..., alias="x-api-key", description="API key for authentication")
-):
+
+@app.post(
+    "/api/message",
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"example": _MESSAGE_REQUEST_EXAMPLE}}
+        }
+    },
+    responses={200: {"content": {"application/json": {"example": _FAST_RESPONSE}}}}
+)
+async def process_message(request: Request):
     """
     Process incoming message through honeypot system
     
-    Requires x-api-key header for authentication
-    Accepts flexible request formats
+    Requires x-api-key header for authentication (checked by ApiKeyASGIMiddleware)
+    Accepts flexible request formats: the raw body bytes are parsed once as
+    JSON ({"message": ..., "sender": ...}), otherwise treated as plain text
     """
-    # Verify API key
-    verify_api_key(api_key)
-    
-    # Check if honeypot is initialized
-    if honeypot is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Honeypot system not initialized"
-        )
-    
     try:
         # Read the request body once
-        body_bytes = await request.body()
+        body_bytes = await read_body_fast(request)
         message = ""
         sender = None
         
-        # Try to parse as JSON first
-        if body_bytes:
+        # Try to parse as JSON first (orjson parses the raw bytes, no decode step)
+        if body_bytes and not body_bytes.isspace():
             try:
-                body_str = body_bytes.decode('utf-8')
-                if body_str.strip():  # Only parse if not empty
-                    body_json = json.loads(body_str)
-                    message = body_json.get("message", "")
-                    sender = body_json.get("sender", None)
-                else:
-                    message = ""
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                # If JSON parsing fails, treat as plain text message
+                body_json = orjson.loads(body_bytes)
+                message = body_json.get("message", "")
+                sender = body_json.get("sender", None)
+            except orjson.JSONDecodeError:
+                # If JSON parsing fails (or body isn't UTF-8), treat as plain text message
                 try:
                     message = body_bytes.decode('utf-8')
-                except:
+                except UnicodeDecodeError:
                     message = ""
         
         # Ensure message is a string (handle case where entire JSON is treated as message)
         if isinstance(message, dict):
-            message = json.dumps(message)
+            message = orjson.dumps(message).decode('utf-8')
         
         # ALWAYS use fast validation mode to avoid timeouts
         # The full honeypot with Ollama is too slow for validators (30+ seconds)
         logger.info(f"API: Fast validation mode - message: {message[:100] if message else 'empty'}...")
         
-        # Return immediate response without LLM processing
-        return JSONResponse(content={
-            "success": True,
-            "honeypot_activated": True,
-            "detection_result": {
-                "is_scam": True,
-                "confidence": 0.85,
-                "scam_type": "test_validation",
-                "reasoning": "Honeypot API endpoint is operational and authenticated correctly"
-            },
-            "victim_response": "Thank you for contacting me. Can you provide more details?",
-            "conversation_summary": {
-                "messages_exchanged": 1,
-                "stop_reason": "validation_mode",
-                "scam_type": "test_validation",
-                "confidence": 0.85
-            },
-            "message": "Honeypot API is operational - message processed successfully"
-        })
+        # Return immediate response without LLM processing (pre-serialized body)
+        return Response(content=_FAST_RESPONSE_BYTES, media_type="application/json")
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"API: Error processing message: {e}")
         raise HTTPException(
@@ -200,7 +300,7 @@ async def process_message(
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -215,6 +315,7 @@ if __name__ == "__main__":
     # Get configuration from environment
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "8000"))
+    reload = os.getenv("API_RELOAD", "false").lower() == "true"  # Dev only: file watcher + extra process
     
     logger.info(f"Starting API server on {host}:{port}")
     logger.info(f"API Key configured: {bool(API_KEY)}")
@@ -223,6 +324,9 @@ if __name__ == "__main__":
         "api:app",
         host=host,
         port=port,
-        reload=True,  # Enable auto-reload for development
-        log_level="info"
+        loop="uvloop",  # libuv event loop (uvicorn[standard]); fail loudly if missing
+        http="httptools",  # C HTTP parser instead of pure-Python h11
+        reload=reload,
+        access_log=False,  # No per-request access log line
+        log_level="warning"
     )
@@ -5,14 +5,14 @@ Handles all system settings with environment variable support
 
 import os
 from typing import Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ScamDetectionConfig:
     """Configuration for scam detection module"""
     confidence_threshold: float = 0.85  # Minimum confidence to activate honeypot
@@ -20,9 +20,11 @@ class ScamDetectionConfig:
     pattern_weight: float = 0.3  # Weight for pattern matching
     llm_weight: float = 0.4  # Weight for LLM semantic analysis
     enable_whitelist: bool = True  # Enable sender whitelist
+    skip_decided_llm: bool = True  # Skip the LLM layer when keyword+pattern scores already fix the verdict
+    result_cache_size: int = 4096  # Detection results memoized per (message, sender); 0 disables
     
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class EngagementLimits:
     """Limits to prevent over-engagement"""
     max_messages: int = 15  # Maximum messages per conversation
@@ -32,7 +34,7 @@ class EngagementLimits:
     suspicion_threshold: float = 0.7  # Stop if scammer suspicion detected
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LLMConfig:
     """LLM provider configuration"""
     provider: str = "openai"  # Options: openai, gemini, ollama
@@ -42,9 +44,23 @@ class LLMConfig:
     max_tokens: int = 150  # Maximum response length
     timeout_seconds: int = 10  # API timeout
     enable_fallback: bool = True  # Use pre-written responses if API fails
+    max_concurrency: int = 4  # Maximum in-flight LLM calls
+    max_retries: int = 2  # Retries after a provider call times out or is rate limited
+    rpm: int = 60  # Provider requests per minute for async calls (0 disables the limiter)
+    detection_batch_size: int = 8  # Messages classified per batched detection call
+    retry_backoff_seconds: float = 0.5  # Base delay before a retry (doubles each attempt)
+    cache_size: int = 1024  # Exact-match response cache entries (only used at temperature 0)
+    cache_path: str = ""  # Optional shelve file to persist the response cache across runs
+    semantic_cache: bool = False  # Reuse victim responses for near-duplicate prompts (needs sentence-transformers)
+    semantic_cache_threshold: float = 0.92  # Minimum cosine similarity for a semantic cache hit
+    semantic_cache_size: int = 512  # Entries kept per system prompt
+    semantic_cache_ttl_seconds: int = 3600  # Semantic cache entry lifetime
+    local_classifier: bool = False  # Answer confident scam detections locally (needs scikit-learn)
+    local_classifier_threshold: float = 0.9  # Minimum class probability to skip the LLM
+    local_classifier_log_path: str = "data/detect_cache.jsonl"  # Logged LLM detections used for training
     
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PersonaConfig:
     """Persona management settings"""
     enable_consistency_check: bool = True  # Validate responses against history
@@ -52,7 +68,7 @@ class PersonaConfig:
     typing_delay_seconds: float = 2.0  # Simulate human typing delay
     
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class EntityExtractionConfig:
     """Entity extraction settings"""
     enable_normalization: bool = True  # Normalize extracted data
@@ -60,7 +76,7 @@ class EntityExtractionConfig:
     min_confidence_for_report: float = 0.5  # Minimum confidence to include in report
     
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LegalConfig:
     """Legal and compliance settings"""
     enable_legal_disclaimers: bool = True  # Add disclaimers to reports
@@ -70,7 +86,7 @@ class LegalConfig:
     jurisdiction: str = "IN"  # Country code for legal compliance
     
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LoggingConfig:
     """Logging configuration"""
     log_level: str = "INFO"  # DEBUG, INFO, WARNING, ERROR
@@ -80,13 +96,15 @@ class LoggingConfig:
     
 
 class Config:
-    """Main configuration class"""
+    """Main configuration class (sections are frozen once loaded)"""
     
     def __init__(self):
         # Load all configuration sections
         self.scam_detection = ScamDetectionConfig(
             confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.85")),
-            enable_whitelist=os.getenv("ENABLE_WHITELIST", "true").lower() == "true"
+            enable_whitelist=os.getenv("ENABLE_WHITELIST", "true").lower() == "true",
+            skip_decided_llm=os.getenv("SKIP_DECIDED_LLM", "true").lower() == "true",
+            result_cache_size=int(os.getenv("DETECTION_CACHE_SIZE", "4096"))
         )
         
         self.engagement = EngagementLimits(
@@ -101,7 +119,16 @@ class Config:
             api_key=os.getenv("LLM_API_KEY", ""),
             temperature=float(os.getenv("LLM_TEMPERATURE", "0.7")),
             max_tokens=int(os.getenv("LLM_MAX_TOKENS", "150")),
-            timeout_seconds=int(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+            timeout_seconds=int(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            rpm=int(os.getenv("LLM_RPM", "60")),
+            cache_size=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+            cache_path=os.getenv("LLM_CACHE_PATH", ""),
+            semantic_cache=os.getenv("LLM_SEMANTIC_CACHE", "false").lower() == "true",
+            semantic_cache_threshold=float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            local_classifier=os.getenv("LLM_LOCAL_CLASSIFIER", "false").lower() == "true",
+            local_classifier_log_path=os.getenv("LLM_LOCAL_CLASSIFIER_LOG", "data/detect_cache.jsonl")
         )
         
         self.persona = PersonaConfig(
@@ -130,13 +157,13 @@ class Config:
     def to_dict(self) -> Dict[str, Any]:
         """Convert configuration to dictionary"""
         return {
-            "scam_detection": self.scam_detection.__dict__,
-            "engagement": self.engagement.__dict__,
-            "llm": {**self.llm.__dict__, "api_key": "***"},  # Mask API key
-            "persona": self.persona.__dict__,
-            "entity_extraction": self.entity_extraction.__dict__,
-            "legal": self.legal.__dict__,
-            "logging": self.logging.__dict__
+            "scam_detection": asdict(self.scam_detection),
+            "engagement": asdict(self.engagement),
+            "llm": {**asdict(self.llm), "api_key": "***"},  # Mask API key
+            "persona": asdict(self.persona),
+            "entity_extraction": asdict(self.entity_extraction),
+            "legal": asdict(self.legal),
+            "logging": asdict(self.logging)
         }
     
     def validate(self) -> tuple[bool, str]:
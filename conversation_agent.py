@@ -3,7 +3,8 @@ Conversation Agent with Context-Aware Response Generation
 Addresses Drawback #8: LLM Limitations
 """
 
-import time
+import asyncio
+import random
 from typing import Dict, Any, Optional
 from utils import logger
 from llm_interface import llm
@@ -13,17 +14,28 @@ from entity_extractor import extractor
 from config import config
 
 
+# Graceful exit messages used when a stop condition triggers
+EXIT_MESSAGES: tuple[str, ...] = (
+    "Thank you for the information. I need to think about this and discuss with my family.",
+    "I appreciate your help. Let me check with my bank first and get back to you.",
+    "This sounds good, but I need some time to arrange the money. I'll contact you later.",
+    "I'm interested, but I need to go now. Can we continue this tomorrow?",
+    "Let me talk to my son/daughter about this first. I'll message you back.",
+)
+
+
 class ConversationAgent:
     """Generates context-aware victim responses"""
     
     def __init__(self):
         self.conversation_active = False
+        self.system_prompt: Optional[str] = None  # Built once per conversation in start_conversation
     
-    def generate_response(self, scammer_message: str) -> Optional[str]:
+    async def generate_response(self, scammer_message: str) -> Optional[str]:
         """Generate victim response to scammer's message"""
         
         # Extract entities from scammer's message
-        entities = extractor.extract(scammer_message, role="scammer")
+        entities = await extractor.aextract(scammer_message, role="scammer")
         if entities:
             logger.info(f"Extracted {len(entities)} entities from scammer message")
         
@@ -42,15 +54,15 @@ class ConversationAgent:
         # Get adaptive prompt additions
         adaptive_prompt = strategy.get_adaptive_prompt_addition(scammer_message)
         
-        # Build full prompt for LLM
-        persona_context = persona_manager.get_persona_context()
+        # Per-turn prompt parts; the persona system prompt is fixed per conversation
         conversation_history = persona_manager.get_conversation_history()
         
         # Generate response
-        response_obj = llm.generate_victim_response(
-            persona_context=persona_context + adaptive_prompt,
+        response_obj = await llm.agenerate_victim_response(
+            system_prompt=self.system_prompt,
             conversation_history=conversation_history,
-            scammer_message=scammer_message
+            scammer_message=scammer_message,
+            guidance=adaptive_prompt
         )
         
         if not response_obj.success:
@@ -64,11 +76,12 @@ class ConversationAgent:
         if not is_consistent:
             logger.warning(f"Response failed consistency check: {error}")
             # Try one more time with explicit consistency reminder
-            retry_prompt = f"{persona_context}\n\nIMPORTANT: Your previous response was inconsistent. Remember your persona details and stay consistent."
-            response_obj = llm.generate_victim_response(
-                persona_context=retry_prompt,
+            retry_guidance = "\nIMPORTANT: Your previous response was inconsistent. Remember your persona details and stay consistent.\n"
+            response_obj = await llm.agenerate_victim_response(
+                system_prompt=self.system_prompt,
                 conversation_history=conversation_history,
-                scammer_message=scammer_message
+                scammer_message=scammer_message,
+                guidance=retry_guidance
             )
             response = response_obj.content if response_obj.success else "I'm not sure what you mean."
         
@@ -82,26 +95,18 @@ class ConversationAgent:
         # Simulate typing delay
         typing_delay = persona_manager.get_typing_delay(len(response))
         logger.debug(f"Simulating typing delay: {typing_delay:.2f}s")
-        time.sleep(min(typing_delay, 5.0))  # Cap at 5 seconds
+        await asyncio.sleep(min(typing_delay, 5.0))  # Cap at 5 seconds; doesn't block the event loop
         
         return response
     
     def _generate_exit_message(self) -> str:
         """Generate graceful exit message"""
-        exit_messages = [
-            "Thank you for the information. I need to think about this and discuss with my family.",
-            "I appreciate your help. Let me check with my bank first and get back to you.",
-            "This sounds good, but I need some time to arrange the money. I'll contact you later.",
-            "I'm interested, but I need to go now. Can we continue this tomorrow?",
-            "Let me talk to my son/daughter about this first. I'll message you back.",
-        ]
-        
-        import random
-        return random.choice(exit_messages)
+        return EXIT_MESSAGES[random.randrange(len(EXIT_MESSAGES))]
     
     def start_conversation(self, scam_type):
         """Initialize conversation with appropriate persona"""
         persona = persona_manager.select_persona(scam_type)
+        self.system_prompt = llm.build_victim_system_prompt(persona_manager.get_persona_context())
         self.conversation_active = True
         logger.info(f"Started conversation with persona: {persona.name}")
         return persona
@@ -4,13 +4,62 @@ Addresses Drawbacks #5, #12: Poor Extraction & Fake Intelligence
 """
 
 import re
-from typing import Dict, Any, List, Optional
+import sys
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from utils import logger, DataNormalizer
 from config import config
 
 
+# Extraction flags are fixed at import (config sections are frozen)
+_ENABLE_NORMALIZATION = config.entity_extraction.enable_normalization
+_ENABLE_URL_EXPANSION = config.entity_extraction.enable_url_expansion
+
+# TLDs that mark an "@" handle as an email rather than a UPI ID
+EMAIL_DOMAINS = ('.com', '.org', '.net', '.in', '.co', '.edu', '.gov')
+
+# Phrases indicating the scammer explicitly handed over the entity
+HIGH_CONFIDENCE_PATTERNS = [
+    re.compile(r'(?:my|our)\s+(?:account|upi|number|phone)', re.IGNORECASE),
+    re.compile(r'(?:send|transfer|pay)\s+(?:to|at)', re.IGNORECASE),
+    re.compile(r'(?:use|enter)\s+(?:this|the)', re.IGNORECASE),
+]
+
+
+# Scam campaigns reuse the same short links, so successful expansions are kept
+# (url -> resolved url, LRU ordered); failures are not, and get retried. Shared
+# by the worker threads aextract() resolves in.
+_RESOLVED_URLS: "OrderedDict[str, str]" = OrderedDict()
+_RESOLVED_URLS_LOCK = threading.Lock()
+_RESOLVED_URLS_MAX = 4096
+
+
+def _resolve_url(url: str) -> str:
+    """Follow redirects for a URL (the input URL is returned if that fails)"""
+    with _RESOLVED_URLS_LOCK:
+        resolved = _RESOLVED_URLS.get(url)
+        if resolved is not None:
+            _RESOLVED_URLS.move_to_end(url)
+            return resolved
+    
+    try:
+        import requests
+        resolved = requests.head(url, allow_redirects=True, timeout=3).url
+    except:
+        logger.warning(f"Failed to expand URL: {url}")
+        return url
+    
+    with _RESOLVED_URLS_LOCK:
+        _RESOLVED_URLS[url] = resolved
+        if len(_RESOLVED_URLS) > _RESOLVED_URLS_MAX:
+            _RESOLVED_URLS.popitem(last=False)
+    return resolved
+
+
 class EntityType(Enum):
     """Types of entities to extract"""
     BANK_ACCOUNT = "bank_account"
@@ -50,104 +99,187 @@ class ExtractedEntity:
         }
 
 
+def _fuse_patterns(patterns, exclude=frozenset()) -> re.Pattern:
+    """Fuse (type, regex) pairs into one alternation with a named group per pattern,
+    leaving out the types in `exclude` (group names keep each pattern's index)"""
+    return re.compile(
+        "|".join(f"(?P<{entity_type.value}_{i}>{pattern})"
+                 for i, (entity_type, pattern) in enumerate(patterns)
+                 if entity_type not in exclude),
+        re.IGNORECASE
+    )
+
+
+def _fuse_patterns_by_length(patterns, min_len) -> Tuple[Tuple[int, re.Pattern], ...]:
+    """(length, fused regex) pairs, longest first; each regex covers only the
+    types whose shortest match fits in that length"""
+    return tuple(
+        (length, _fuse_patterns(patterns, {t for t, n in min_len.items() if n > length}))
+        for length in sorted(set(min_len.values()), reverse=True)
+    )
+
+
 class EntityExtractor:
     """Extracts and normalizes fraud infrastructure data"""
     
-    # Enhanced regex patterns
-    PATTERNS = {
-        EntityType.BANK_ACCOUNT: [
-            r'\b(\d[\s\-]*){9,18}\b',  # 9-18 digits with optional spaces/dashes
-            r'account\s*(?:number|no\.?|#)?\s*:?\s*(\d[\s\-]*){9,18}',
-        ],
-        EntityType.UPI_ID: [
-            r'\b([a-zA-Z0-9._-]+)@([a-zA-Z0-9.-]+)\b',
-            r'\b([a-zA-Z0-9._-]+)\s*(?:\(at\)|\[at\]|at)\s*([a-zA-Z0-9.-]+)\b',
-        ],
-        EntityType.PHONE_NUMBER: [
-            r'\+?\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
-            r'\b(\d[\s\-]*){10,15}\b',
-        ],
-        EntityType.URL: [
-            r'https?://[^\s]+',
-            r'www\.[^\s]+',
-            r'bit\.ly/[^\s]+',
-            r'tinyurl\.com/[^\s]+',
-        ],
-        EntityType.EMAIL: [
-            r'\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b',
-        ],
-        EntityType.CRYPTO_ADDRESS: [
-            r'\b[13][a-km-zA-HJ-NP-Z1-9]{25,34}\b',  # Bitcoin
-            r'\b0x[a-fA-F0-9]{40}\b',  # Ethereum
-        ],
+    # Enhanced regex patterns, in specificity order. They are fused into a
+    # single alternation so each message is scanned once; the scan is
+    # leftmost-first, so when two alternatives match at the same position
+    # the earlier (more specific) one wins.
+    PATTERNS = [
+        (EntityType.URL, r'https?://[^\s]+'),
+        (EntityType.URL, r'www\.[^\s]+'),
+        (EntityType.URL, r'bit\.ly/[^\s]+'),
+        (EntityType.URL, r'tinyurl\.com/[^\s]+'),
+        (EntityType.EMAIL, r'\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b'),
+        (EntityType.CRYPTO_ADDRESS, r'\b[13][a-km-zA-HJ-NP-Z1-9]{25,34}\b'),  # Bitcoin
+        (EntityType.CRYPTO_ADDRESS, r'\b0x[a-fA-F0-9]{40}\b'),  # Ethereum
+        (EntityType.BANK_ACCOUNT, r'account\s*(?:number|no\.?|#)?\s*:?\s*(?P<account_number>(?:\d[\s\-]*){9,18})'),
+        # Not inside a longer digit run, which belongs to the digit-run patterns below
+        (EntityType.PHONE_NUMBER, r'(?:\+|(?<!\d))\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}(?!\d)'),
+        (EntityType.UPI_ID, r'\b([a-zA-Z0-9._-]+)@([a-zA-Z0-9.-]+)\b'),
+        (EntityType.PHONE_NUMBER, r'\b(\d[\s\-]*){10,15}\b'),
+        (EntityType.BANK_ACCOUNT, r'\b(\d[\s\-]*){9,18}\b'),  # 9-18 digits with optional spaces/dashes
+        # Obfuscated "name at handle": the handle must start with a letter and
+        # must not run into an email address, or it would swallow the phone
+        # numbers / emails that follow "at" in plain prose
+        (EntityType.UPI_ID, r'\b([a-zA-Z0-9._-]+)\s*(?:\(at\)|\[at\]|at)\s*([a-zA-Z][a-zA-Z0-9.-]*)\b(?![.\-]?[\w@])'),
+    ]
+    
+    # Shortest text each entity type can match (e.g. "a@b" for UPI, 9 digits for
+    # a bank account); a message shorter than that can't contain the type
+    MIN_LEN = {
+        EntityType.URL: 5,  # www.x
+        EntityType.EMAIL: 6,  # a@b.cc
+        EntityType.UPI_ID: 3,  # a@b
+        EntityType.CRYPTO_ADDRESS: 26,
+        EntityType.BANK_ACCOUNT: 9,
+        EntityType.PHONE_NUMBER: 10,
+    }
+    
+    # Named group per pattern, e.g. (?P<url_0>...)|(?P<email_4>...)
+    COMBINED_PATTERN = _fuse_patterns(PATTERNS)
+    GROUP_TO_TYPE = {
+        f"{entity_type.value}_{i}": entity_type
+        for i, (entity_type, _) in enumerate(PATTERNS)
     }
     
+    # (min length, fused regex) tiers, longest first; each leaves out the types
+    # whose MIN_LEN exceeds it, so short messages never scan for them
+    PATTERNS_BY_LENGTH = _fuse_patterns_by_length(PATTERNS, MIN_LEN)
+    
+    URL_PATTERN = re.compile(
+        "|".join(pattern for entity_type, pattern in PATTERNS if entity_type == EntityType.URL),
+        re.IGNORECASE
+    )
+    
+    # Confidence levels counted as usable intelligence
+    HIGH_VALUE_CONFIDENCE = (ConfidenceLevel.HIGH, ConfidenceLevel.MEDIUM)
+    
     def __init__(self):
         self.extracted_entities: List[ExtractedEntity] = []
+        self._seen: Set[Tuple[EntityType, str]] = set()  # (type, normalized value) dedup keys
+        self._high_value_count = 0
     
     def extract(self, message: str, role: str = "scammer") -> List[ExtractedEntity]:
         """Extract all entities from a message"""
         entities = []
         
-        # Extract each entity type
-        for entity_type, patterns in self.PATTERNS.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, message, re.IGNORECASE)
-                
-                for match in matches:
-                    raw_value = match.group(0)
-                    
-                    # Skip if it's part of a legitimate domain (for UPI/email)
-                    if entity_type == EntityType.UPI_ID:
-                        if self._is_likely_email(raw_value):
-                            continue
-                    
-                    # Normalize the value
-                    normalized_value = self._normalize(raw_value, entity_type)
-                    
-                    # Determine confidence level
-                    confidence = self._assess_confidence(normalized_value, entity_type, message, role)
-                    
-                    # Get context (surrounding text)
-                    context = self._get_context(message, match.start(), match.end())
-                    
-                    entity = ExtractedEntity(
-                        entity_type=entity_type,
-                        value=raw_value,
-                        normalized_value=normalized_value,
-                        confidence=confidence,
-                        context=context,
-                        source_message=message
-                    )
-                    
-                    entities.append(entity)
-                    logger.debug(f"Extracted {entity_type.value}: {normalized_value} (confidence: {confidence.value})")
+        # Only the entity types that fit in the message are scanned for; one too
+        # short to hold any entity ("hi", "ok") skips the scan entirely
+        pattern = self._pattern_for_length(len(message))
+        if pattern is None:
+            return entities
+        
+        # Extract all those entity types in a single pass over the message
+        for match in pattern.finditer(message):
+            entity_type = self.GROUP_TO_TYPE[match.lastgroup]
+            raw_value = match.group(0)
+            
+            # "account number: ..." matches keep only the digits
+            if entity_type == EntityType.BANK_ACCOUNT and match.group('account_number'):
+                raw_value = match.group('account_number').rstrip()
+            
+            # Skip if it's part of a legitimate domain (for UPI/email)
+            if entity_type == EntityType.UPI_ID:
+                if self._is_likely_email(raw_value):
+                    continue
+            
+            # Normalize the value
+            normalized_value = self._normalize(raw_value, entity_type)
+            
+            # Determine confidence level
+            confidence = self._assess_confidence(normalized_value, entity_type, message, role)
+            
+            # Get context (surrounding text)
+            context = self._get_context(message, match.start(), match.end())
+            
+            entity = ExtractedEntity(
+                entity_type=entity_type,
+                value=raw_value,
+                normalized_value=normalized_value,
+                confidence=confidence,
+                context=context,
+                source_message=message
+            )
+            
+            entities.append(entity)
+            logger.debug(f"Extracted {entity_type.value}: {normalized_value} (confidence: {confidence.value})")
         
         # Add to global list (deduplicate)
         for entity in entities:
-            if not self._is_duplicate(entity):
+            key = (entity.entity_type, entity.normalized_value)
+            if key not in self._seen:
+                self._seen.add(key)
                 self.extracted_entities.append(entity)
+                if entity.confidence in self.HIGH_VALUE_CONFIDENCE:
+                    self._high_value_count += 1
         
         return entities
     
+    def _pattern_for_length(self, length: int) -> Optional[re.Pattern]:
+        """Fused regex for the entity types a message of this length can contain"""
+        for min_len, pattern in self.PATTERNS_BY_LENGTH:
+            if length >= min_len:
+                return pattern
+        return None
+    
+    async def aextract(self, message: str, role: str = "scammer") -> List[ExtractedEntity]:
+        """Async variant of extract() for use inside the event loop
+        
+        URL expansion is a blocking HTTP request, so all URLs in the message are
+        resolved concurrently in worker threads first; extract() then hits the cache.
+        """
+        if _ENABLE_NORMALIZATION and _ENABLE_URL_EXPANSION:
+            urls = {DataNormalizer.normalize_url(m.group(0)) for m in self.URL_PATTERN.finditer(message)}
+            if urls:
+                await asyncio.gather(*(asyncio.to_thread(_resolve_url, url) for url in urls))
+        
+        return self.extract(message, role)
+    
     def _normalize(self, value: str, entity_type: EntityType) -> str:
         """Normalize extracted value"""
-        if not config.entity_extraction.enable_normalization:
+        if not _ENABLE_NORMALIZATION:
             return value
         
+        # Short, frequently repeated identifiers are interned so the dedup set
+        # keeps one copy and equal keys compare by identity
         if entity_type == EntityType.BANK_ACCOUNT:
-            return DataNormalizer.normalize_bank_account(value)
+            return sys.intern(DataNormalizer.normalize_bank_account(value))
         
         elif entity_type == EntityType.UPI_ID:
-            return DataNormalizer.normalize_upi(value)
+            return sys.intern(DataNormalizer.normalize_upi(value))
         
         elif entity_type == EntityType.PHONE_NUMBER:
-            return DataNormalizer.normalize_phone(value)
+            return sys.intern(DataNormalizer.normalize_phone(value))
+        
+        elif entity_type == EntityType.EMAIL:
+            return sys.intern(value.strip())
         
         elif entity_type == EntityType.URL:
             normalized = DataNormalizer.normalize_url(value)
             # Optionally expand shortened URLs
-            if config.entity_extraction.enable_url_expansion:
+            if _ENABLE_URL_EXPANSION:
                 normalized = self._expand_url(normalized)
             return normalized
         
@@ -156,13 +288,7 @@ class EntityExtractor:
     
     def _expand_url(self, url: str) -> str:
         """Expand shortened URLs"""
-        try:
-            import requests
-            response = requests.head(url, allow_redirects=True, timeout=3)
-            return response.url
-        except:
-            logger.warning(f"Failed to expand URL: {url}")
-            return url
+        return _resolve_url(url)
     
     def _assess_confidence(self, value: str, entity_type: EntityType, 
                           message: str, role: str) -> ConfidenceLevel:
@@ -177,14 +303,8 @@ class EntityExtractor:
             return ConfidenceLevel.NEEDS_VERIFICATION
         
         # Check if explicitly provided (high confidence indicators)
-        high_confidence_patterns = [
-            r'(?:my|our)\s+(?:account|upi|number|phone)',
-            r'(?:send|transfer|pay)\s+(?:to|at)',
-            r'(?:use|enter)\s+(?:this|the)',
-        ]
-        
-        for pattern in high_confidence_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
+        for pattern in HIGH_CONFIDENCE_PATTERNS:
+            if pattern.search(message):
                 return ConfidenceLevel.HIGH
         
         # Medium confidence by default (extracted from context)
@@ -198,33 +318,28 @@ class EntityExtractor:
     
     def _is_likely_email(self, value: str) -> bool:
         """Check if UPI ID is actually an email"""
-        email_domains = ['.com', '.org', '.net', '.in', '.co', '.edu', '.gov']
-        return any(value.lower().endswith(domain) for domain in email_domains)
+        return value.lower().endswith(EMAIL_DOMAINS)
     
     def _is_duplicate(self, entity: ExtractedEntity) -> bool:
         """Check if entity already extracted"""
-        for existing in self.extracted_entities:
-            if (existing.entity_type == entity.entity_type and 
-                existing.normalized_value == entity.normalized_value):
-                return True
-        return False
+        return (entity.entity_type, entity.normalized_value) in self._seen
     
     def get_high_value_entities(self) -> List[ExtractedEntity]:
         """Get entities with high confidence"""
         return [
             e for e in self.extracted_entities 
-            if e.confidence in [ConfidenceLevel.HIGH, ConfidenceLevel.MEDIUM]
+            if e.confidence in self.HIGH_VALUE_CONFIDENCE
         ]
     
     def get_entity_count(self) -> int:
-        """Get count of high-value entities"""
-        return len(self.get_high_value_entities())
+        """Get count of high-value entities (maintained incrementally)"""
+        return self._high_value_count
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert all entities to dictionary"""
         return {
             "total_entities": len(self.extracted_entities),
-            "high_value_entities": len(self.get_high_value_entities()),
+            "high_value_entities": self._high_value_count,
             "entities_by_type": self._group_by_type(),
             "all_entities": [e.to_dict() for e in self.extracted_entities]
         }
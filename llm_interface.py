@@ -3,11 +3,41 @@ LLM Interface with Strict Prompt Control
 Prevents hallucinations and accidental scammer assistance
 """
 
+import re
 import time
-from typing import Optional, Dict, Any, List
+import orjson
+import atexit
+import random
+import asyncio
+import contextlib
+import hashlib
+import weakref
+import threading
+import itertools
+import concurrent.futures
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Sequence, Tuple
 from dataclasses import dataclass
 from config import config
-from utils import logger, truncate_text
+from utils import logger, truncate_text, KeywordMatcher
+from local_classifier import local_classifier
+
+
+# Reasoning of the conservative result returned when scam detection fails
+DETECTION_FAILED_REASONING = "LLM analysis failed"
+
+
+# Markdown code fences models often wrap JSON output in (```json ... ```)
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.MULTILINE)
+
+
+def _strip_code_fences(content: str) -> str:
+    """Remove code fences around LLM JSON output"""
+    return _CODE_FENCE.sub("", content).strip()
+
+
+# Speaker labels for conversation history in victim prompts
+_ROLE_LABELS = {"scammer": "Scammer"}
 
 
 @dataclass
@@ -19,6 +49,7 @@ class LLMResponse:
     tokens_used: int = 0
     latency_ms: float = 0.0
     used_fallback: bool = False
+    cached: bool = False
 
 
 class PromptGuardrails:
@@ -35,6 +66,16 @@ CRITICAL RULES:
 
 Output format: JSON with keys: is_scam (boolean), confidence (0.0-1.0), scam_type (string), reasoning (string)"""
 
+    SCAM_DETECTION_BATCH_SYSTEM_PROMPT = """You are a scam detection AI. Analyze each numbered message independently and determine if it's a scam.
+
+CRITICAL RULES:
+- Only classify as scam if you have strong evidence
+- Consider context: legitimate businesses may ask for information
+- DO NOT be overly aggressive - false positives are costly
+- Keep reasoning to one short sentence per message
+
+Output format: a JSON array with one object per message, keys: idx (the message number), is_scam (boolean), confidence (0.0-1.0), scam_type (string), reasoning (string)"""
+
     VICTIM_PERSONA_SYSTEM_PROMPT = """You are roleplaying as a vulnerable person who has received a scam message.
 
 CRITICAL RULES - YOU MUST FOLLOW THESE:
@@ -76,31 +117,123 @@ If you cannot respond appropriately, say: "I'm not sure what you mean, can you e
         "the process works",
     ]
     
+    TECHNICAL_TERMS = ['algorithm', 'api', 'database', 'encryption', 'protocol']
+    
+    # Forbidden phrases and jargon are scanned together in a single pass
+    _VALIDATION_MATCHER = KeywordMatcher(RESPONSE_VALIDATION_RULES + TECHNICAL_TERMS)
+    
     @staticmethod
     def validate_victim_response(response: str) -> tuple[bool, Optional[str]]:
         """Validate that victim response doesn't break character"""
-        response_lower = response.lower()
+        # One casefolded copy feeds the single automaton pass
+        found = PromptGuardrails._VALIDATION_MATCHER.find_all(response.casefold())
         
         # Check for forbidden phrases
-        for forbidden in PromptGuardrails.RESPONSE_VALIDATION_RULES:
-            if forbidden in response_lower:
-                return False, f"Response contains forbidden phrase: '{forbidden}'"
+        if found:
+            for forbidden in PromptGuardrails.RESPONSE_VALIDATION_RULES:
+                if forbidden in found:
+                    return False, f"Response contains forbidden phrase: '{forbidden}'"
         
         # Check length (victims don't write essays)
         if len(response.split()) > 50:
             return False, "Response too long for victim persona"
         
         # Check for technical jargon
-        technical_terms = ['algorithm', 'api', 'database', 'encryption', 'protocol']
-        if any(term in response_lower for term in technical_terms):
+        if found:
             return False, "Response contains technical jargon"
         
         return True, None
 
 
+class SemanticCache:
+    """
+    Reuses responses for near-duplicate prompts
+    
+    Prompts are embedded with a SentenceTransformer model (L2-normalized, so a
+    dot product is the cosine similarity) and grouped by system prompt, since a
+    response is only reusable under the same instructions. Entries expire after
+    a TTL; when full, the least recently used entry is evicted.
+    """
+    
+    MODEL_NAME = "all-MiniLM-L6-v2"
+    
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: int):
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+        
+        self._np = np
+        self.model = SentenceTransformer(self.MODEL_NAME)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # system prompt -> {"embeddings": [N, dim] matrix, "contents", "created", "last_used"}
+        self._buckets: Dict[str, Dict[str, Any]] = {}
+    
+    def embed(self, text: str):
+        """Embed text as a unit vector"""
+        return self.model.encode(text, normalize_embeddings=True)
+    
+    def get(self, namespace: str, embedding) -> Optional[str]:
+        """Return the cached response most similar to embedding, if above threshold"""
+        bucket = self._buckets.get(namespace)
+        if bucket is None:
+            return None
+        
+        self._expire(bucket)
+        if not bucket["contents"]:
+            return None
+        
+        similarities = bucket["embeddings"] @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+        
+        bucket["last_used"][best] = time.time()
+        return bucket["contents"][best]
+    
+    def put(self, namespace: str, embedding, content: str):
+        """Cache a response under its prompt embedding"""
+        bucket = self._buckets.get(namespace)
+        if bucket is None:
+            bucket = {
+                "embeddings": self._np.empty((0, embedding.shape[0]), dtype=embedding.dtype),
+                "contents": [],
+                "created": [],
+                "last_used": [],
+            }
+            self._buckets[namespace] = bucket
+        
+        self._expire(bucket)
+        if len(bucket["contents"]) >= self.max_entries:
+            self._drop(bucket, [int(self._np.argmin(bucket["last_used"]))])
+        
+        now = time.time()
+        bucket["embeddings"] = self._np.vstack([bucket["embeddings"], embedding])
+        bucket["contents"].append(content)
+        bucket["created"].append(now)
+        bucket["last_used"].append(now)
+    
+    def _expire(self, bucket: Dict[str, Any]):
+        """Drop entries older than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [i for i, created in enumerate(bucket["created"]) if created < cutoff]
+        if expired:
+            self._drop(bucket, expired)
+    
+    def _drop(self, bucket: Dict[str, Any], indices: List[int]):
+        """Remove entries by index"""
+        keep = set(range(len(bucket["contents"]))) - set(indices)
+        bucket["embeddings"] = self._np.delete(bucket["embeddings"], indices, axis=0)
+        for field in ("contents", "created", "last_used"):
+            bucket[field] = [value for i, value in enumerate(bucket[field]) if i in keep]
+
+
 class LLMInterface:
     """Interface to LLM providers with strict controls"""
     
+    OLLAMA_BASE_URL = "http://localhost:11434"
+    GEMINI_CACHE_TTL_SECONDS = 600  # Lifetime of a Gemini context cache for a system prompt
+    
     def __init__(self):
         self.provider = config.llm.provider
         self.model = config.llm.model
@@ -115,7 +248,102 @@ class LLMInterface:
             "Okay, what do I need to do?",
             "I'm interested, but I want to make sure this is safe.",
         ]
-        self.fallback_index = 0
+        self._fallback_cycle = itertools.cycle(self.fallback_responses)
+        
+        # Gemini models per system prompt: system prompt -> (model, expires_at)
+        self._gemini_models: Dict[str, Tuple[Any, float]] = {}
+        self._gemini_caching_enabled = self.provider == "gemini"
+        
+        # Sync provider calls run on this pool so they can be given a hard deadline;
+        # its size caps how many run at once
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.llm.max_concurrency,
+            thread_name_prefix="llm"
+        )
+        
+        # Async state, one of each per event loop (connection pools are
+        # loop-bound): concurrency semaphore, OpenAI client, Ollama HTTP client
+        self._async_openai = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self._semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self._async_http = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient (Ollama)
+        self._rate_limiter = self._create_rate_limiter()
+        
+        # Exact-match response cache: only deterministic (temperature 0) output
+        # is safe to replay. Maps key -> (content, tokens_used), LRU ordered.
+        self.cache_enabled = config.llm.temperature == 0 and config.llm.cache_size > 0
+        self._response_cache: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._disk_cache = None
+        if self.cache_enabled and config.llm.cache_path:
+            self._open_disk_cache(config.llm.cache_path)
+        
+        # Semantic cache for paraphrased victim-response prompts (optional dependency)
+        self.semantic_cache: Optional[SemanticCache] = None
+        if config.llm.semantic_cache:
+            try:
+                self.semantic_cache = SemanticCache(
+                    threshold=config.llm.semantic_cache_threshold,
+                    max_entries=config.llm.semantic_cache_size,
+                    ttl_seconds=config.llm.semantic_cache_ttl_seconds
+                )
+                logger.info("Initialized semantic response cache")
+            except Exception as e:
+                logger.warning(f"Semantic cache disabled (install sentence-transformers): {e}")
+    
+    def _create_rate_limiter(self):
+        """Requests-per-minute limiter for async calls (no-op if disabled or aiolimiter missing)"""
+        if config.llm.rpm <= 0:
+            return contextlib.nullcontext()
+        try:
+            from aiolimiter import AsyncLimiter
+            return AsyncLimiter(max_rate=config.llm.rpm, time_period=60)
+        except ImportError:
+            logger.warning("aiolimiter not installed; LLM calls are not rate limited")
+            return contextlib.nullcontext()
+    
+    def _open_disk_cache(self, path: str):
+        """Open the optional on-disk cache shared across runs"""
+        try:
+            import shelve
+            self._disk_cache = shelve.open(path)
+            atexit.register(self._disk_cache.close)
+            logger.info(f"LLM response cache persisted to {path}")
+        except Exception as e:
+            logger.warning(f"Could not open LLM cache file {path}: {e}")
+    
+    def _cache_key(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """Hash everything that determines the model output"""
+        payload = orjson.dumps({
+            "provider": self.provider,
+            "model": self.model,
+            "system": system_prompt,
+            "user": user_prompt,
+            "temperature": config.llm.temperature,
+            "max_tokens": max_tokens,
+        }, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+    
+    def _cache_get(self, key: str) -> Optional[Tuple[str, int]]:
+        """Look up a cached (content, tokens_used), checking memory then disk"""
+        entry = self._response_cache.get(key)
+        if entry is not None:
+            self._response_cache.move_to_end(key)
+            return entry
+        
+        if self._disk_cache is not None:
+            entry = self._disk_cache.get(key)
+            if entry is not None:
+                self._cache_put(key, entry, persist=False)
+        return entry
+    
+    def _cache_put(self, key: str, entry: Tuple[str, int], persist: bool = True):
+        """Store a response, evicting the least recently used entry when full"""
+        self._response_cache[key] = entry
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > config.llm.cache_size:
+            self._response_cache.popitem(last=False)
+        
+        if persist and self._disk_cache is not None:
+            self._disk_cache[key] = entry
     
     def _initialize_client(self):
         """Initialize LLM client based on provider"""
@@ -133,9 +361,11 @@ class LLMInterface:
                 logger.info("Initialized Gemini client")
             
             elif self.provider == "ollama":
-                # Ollama runs locally, no API key needed
-                import requests
-                self.client = requests
+                # Ollama runs locally, no API key needed; one pooled keep-alive
+                # client instead of a new connection per request
+                import httpx
+                self.client = httpx.Client(**self._ollama_client_options())
+                atexit.register(self.client.close)
                 logger.info("Initialized Ollama client (local)")
             
             else:
@@ -146,9 +376,9 @@ class LLMInterface:
             if not config.llm.enable_fallback:
                 raise
     
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> LLMResponse:
+    def _call_openai(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
         """Call OpenAI API"""
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         try:
             response = self.client.ChatCompletion.create(
@@ -158,13 +388,13 @@ class LLMInterface:
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=config.llm.temperature,
-                max_tokens=config.llm.max_tokens,
+                max_tokens=max_tokens,
                 timeout=config.llm.timeout_seconds
             )
             
             content = response.choices[0].message.content.strip()
             tokens = response.usage.total_tokens
-            latency = (time.time() - start_time) * 1000
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
             
             return LLMResponse(
                 content=content,
@@ -177,26 +407,63 @@ class LLMInterface:
             logger.error(f"OpenAI API error: {e}")
             return LLMResponse(content="", success=False, error=str(e))
     
-    def _call_gemini(self, system_prompt: str, user_prompt: str) -> LLMResponse:
-        """Call Gemini API"""
-        start_time = time.time()
+    def _gemini_model(self, system_prompt: str):
+        """
+        Gemini model for a system prompt, backed by a server-side context cache
         
-        try:
+        The system prompt is stable for a whole conversation, so it is cached
+        once (CachedContent, with a TTL) and later turns only send the new
+        content. If caching is unavailable (older SDK, model without caching,
+        prompt below the minimum cacheable size) it falls back to sending
+        system_instruction on every call and stops trying.
+        """
+        entry = self._gemini_models.get(system_prompt)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        
+        model = None
+        expires_at = float("inf")
+        if self._gemini_caching_enabled:
+            try:
+                import datetime
+                cache = self.client.caching.CachedContent.create(
+                    model=self.model,
+                    system_instruction=system_prompt,
+                    ttl=datetime.timedelta(seconds=self.GEMINI_CACHE_TTL_SECONDS)
+                )
+                model = self.client.GenerativeModel.from_cached_content(cached_content=cache)
+                expires_at = time.time() + self.GEMINI_CACHE_TTL_SECONDS - 30  # Renew shortly before expiry
+                logger.debug(f"Created Gemini context cache {cache.name}")
+            except Exception as e:
+                logger.info(f"Gemini context caching unavailable, sending system prompt per call: {e}")
+                self._gemini_caching_enabled = False
+        
+        if model is None:
             model = self.client.GenerativeModel(
                 model_name=self.model,
                 system_instruction=system_prompt
             )
+        
+        self._gemini_models[system_prompt] = (model, expires_at)
+        return model
+    
+    def _call_gemini(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call Gemini API"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            model = self._gemini_model(system_prompt)
             
             response = model.generate_content(
                 user_prompt,
                 generation_config={
                     'temperature': config.llm.temperature,
-                    'max_output_tokens': config.llm.max_tokens,
+                    'max_output_tokens': max_tokens,
                 }
             )
             
             content = response.text.strip()
-            latency = (time.time() - start_time) * 1000
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
             
             return LLMResponse(
                 content=content,
@@ -208,60 +475,444 @@ class LLMInterface:
             logger.error(f"Gemini API error: {e}")
             return LLMResponse(content="", success=False, error=str(e))
     
-    def _call_ollama(self, system_prompt: str, user_prompt: str) -> LLMResponse:
+    def _call_ollama(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
         """Call Ollama (local)"""
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         try:
             response = self.client.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": f"{system_prompt}\n\nUser: {user_prompt}\n\nAssistant:",
-                    "stream": False,
-                    "options": {
-                        "temperature": config.llm.temperature,
-                        "num_predict": config.llm.max_tokens
-                    }
-                },
+                "/api/generate",
+                content=self._ollama_body(system_prompt, user_prompt, max_tokens)
+            )
+            
+            content = orjson.loads(response.content)["response"].strip()
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            return LLMResponse(
+                content=content,
+                success=True,
+                latency_ms=latency
+            )
+        
+        except Exception as e:
+            logger.error(f"Ollama API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    @staticmethod
+    def _ollama_client_options() -> Dict[str, Any]:
+        """Connection settings shared by the sync and async Ollama clients"""
+        import httpx
+        return {
+            "base_url": LLMInterface.OLLAMA_BASE_URL,
+            "http2": True,  # Used when the endpoint is TLS; plain http stays on HTTP/1.1 keep-alive
+            "limits": httpx.Limits(max_keepalive_connections=32),
+            "timeout": config.llm.timeout_seconds,
+            "headers": {"content-type": "application/json"},  # Bodies are pre-serialized bytes
+        }
+    
+    def _ollama_body(self, system_prompt: str, user_prompt: str, max_tokens: int,
+                     stream: bool = False) -> bytes:
+        """Build the Ollama /api/generate request body, serialized with orjson"""
+        return orjson.dumps({
+            "model": self.model,
+            "prompt": f"{system_prompt}\n\nUser: {user_prompt}\n\nAssistant:",
+            "stream": stream,
+            "options": {
+                "temperature": config.llm.temperature,
+                "num_predict": max_tokens
+            }
+        })
+    
+    async def _acall_openai(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call OpenAI API (async client)"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            response = await self._get_async_openai().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=config.llm.temperature,
+                max_tokens=max_tokens,
                 timeout=config.llm.timeout_seconds
             )
             
-            content = response.json()["response"].strip()
-            latency = (time.time() - start_time) * 1000
+            content = response.choices[0].message.content.strip()
+            tokens = response.usage.total_tokens
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
             
             return LLMResponse(
                 content=content,
                 success=True,
+                tokens_used=tokens,
                 latency_ms=latency
             )
         
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    async def _acall_gemini(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call Gemini API (async)"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            model = self._gemini_model(system_prompt)
+            
+            response = await model.generate_content_async(
+                user_prompt,
+                generation_config={
+                    'temperature': config.llm.temperature,
+                    'max_output_tokens': max_tokens,
+                }
+            )
+            
+            content = response.text.strip()
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            return LLMResponse(
+                content=content,
+                success=True,
+                latency_ms=latency
+            )
+        
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    async def _acall_ollama(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call Ollama (local, async client)"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            response = await self._get_async_http().post(
+                "/api/generate",
+                content=self._ollama_body(system_prompt, user_prompt, max_tokens)
+            )
+            
+            content = orjson.loads(response.content)["response"].strip()
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            return LLMResponse(
+                content=content,
+                success=True,
+                latency_ms=latency
+            )
+        
+        except Exception as e:
+            logger.error(f"Ollama API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    def _get_async_openai(self):
+        """Async OpenAI client for the running event loop (its httpx pool is loop-bound)"""
+        loop = asyncio.get_running_loop()
+        client = self._async_openai.get(loop)
+        if client is None:
+            client = self.client.AsyncOpenAI(api_key=config.llm.api_key)
+            self._async_openai[loop] = client
+        return client
+    
+    def _get_async_http(self):
+        """Pooled async Ollama client for the running event loop (connections are loop-bound)"""
+        import httpx
+        loop = asyncio.get_running_loop()
+        client = self._async_http.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(**self._ollama_client_options())
+            self._async_http[loop] = client
+        return client
+    
+    # Streaming variants for victim responses: the partial text is validated as
+    # it arrives and generation is abandoned at the first guardrail violation.
+    # Violations only accumulate (a forbidden phrase stays, word count only
+    # grows), so a partial failure means the full response would fail too; the
+    # partial text is returned and generate's validation swaps in a fallback.
+    
+    @staticmethod
+    def _violates_guardrails(partial: str) -> bool:
+        """Whether streamed text already breaks the victim guardrails"""
+        is_valid, error = PromptGuardrails.validate_victim_response(partial)
+        if not is_valid:
+            logger.debug(f"Aborting streamed response early: {error}")
+        return not is_valid
+    
+    async def _astream_openai(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call OpenAI API with streaming and early abort"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            stream = await self._get_async_openai().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=config.llm.temperature,
+                max_tokens=max_tokens,
+                timeout=config.llm.timeout_seconds,
+                stream=True
+            )
+            
+            content = ""
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content += chunk.choices[0].delta.content
+                    if self._violates_guardrails(content):
+                        await stream.close()
+                        break
+            
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            return LLMResponse(content=content.strip(), success=True, latency_ms=latency)
+        
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    async def _astream_gemini(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call Gemini API with streaming and early abort"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            model = self._gemini_model(system_prompt)
+            
+            stream = await model.generate_content_async(
+                user_prompt,
+                generation_config={
+                    'temperature': config.llm.temperature,
+                    'max_output_tokens': max_tokens,
+                },
+                stream=True
+            )
+            
+            content = ""
+            async for chunk in stream:
+                content += chunk.text
+                if self._violates_guardrails(content):
+                    break
+            
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            return LLMResponse(content=content.strip(), success=True, latency_ms=latency)
+        
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            return LLMResponse(content="", success=False, error=str(e))
+    
+    async def _astream_ollama(self, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """Call Ollama (local) with streaming and early abort"""
+        start_ns = time.perf_counter_ns()
+        
+        try:
+            content = ""
+            async with self._get_async_http().stream(
+                "POST",
+                "/api/generate",
+                content=self._ollama_body(system_prompt, user_prompt, max_tokens, stream=True)
+            ) as response:
+                # One JSON object per line; leaving the block closes the connection
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    content += chunk.get("response", "")
+                    if chunk.get("done") or self._violates_guardrails(content):
+                        break
+            
+            latency = (time.perf_counter_ns() - start_ns) / 1e6
+            return LLMResponse(content=content.strip(), success=True, latency_ms=latency)
+        
         except Exception as e:
             logger.error(f"Ollama API error: {e}")
             return LLMResponse(content="", success=False, error=str(e))
     
     def _get_fallback_response(self) -> str:
         """Get next fallback response"""
-        response = self.fallback_responses[self.fallback_index]
-        self.fallback_index = (self.fallback_index + 1) % len(self.fallback_responses)
-        return response
+        return next(self._fallback_cycle)
     
     def generate(self, system_prompt: str, user_prompt: str, 
-                 validate_response: bool = False) -> LLMResponse:
-        """Generate LLM response with validation"""
-        
-        logger.debug(f"LLM request: {truncate_text(user_prompt)}")
+                 validate_response: bool = False, max_tokens: Optional[int] = None) -> LLMResponse:
+        """Generate LLM response with validation (max_tokens defaults to config.llm.max_tokens)"""
+        max_tokens = max_tokens or config.llm.max_tokens
+        cached, cache_key, prompt_embedding = self._check_caches(system_prompt, user_prompt, validate_response, max_tokens)
+        if cached is not None:
+            return cached
         
         # Call appropriate provider
         if self.provider == "openai":
-            response = self._call_openai(system_prompt, user_prompt)
+            response = self._call_with_timeout(self._call_openai, system_prompt, user_prompt, max_tokens)
+        elif self.provider == "gemini":
+            response = self._call_with_timeout(self._call_gemini, system_prompt, user_prompt, max_tokens)
+        elif self.provider == "ollama":
+            response = self._call_with_timeout(self._call_ollama, system_prompt, user_prompt, max_tokens)
+        else:
+            response = LLMResponse(content="", success=False, error="Unknown provider")
+        
+        return self._finish_response(response, system_prompt, validate_response, cache_key, prompt_embedding)
+    
+    async def agenerate(self, system_prompt: str, user_prompt: str,
+                        validate_response: bool = False, max_tokens: Optional[int] = None) -> LLMResponse:
+        """Async generate(): each provider attempt is awaited, bounded by config.llm.max_concurrency"""
+        max_tokens = max_tokens or config.llm.max_tokens
+        cached, cache_key, prompt_embedding = await self._acheck_caches(system_prompt, user_prompt, validate_response, max_tokens)
+        if cached is not None:
+            return cached
+        
+        # Validated (victim) responses are streamed so a violation stops generation early
+        if self.provider == "openai":
+            call = self._astream_openai if validate_response else self._acall_openai
+            response = await self._acall_with_timeout(call, system_prompt, user_prompt, max_tokens)
         elif self.provider == "gemini":
-            response = self._call_gemini(system_prompt, user_prompt)
+            call = self._astream_gemini if validate_response else self._acall_gemini
+            response = await self._acall_with_timeout(call, system_prompt, user_prompt, max_tokens)
         elif self.provider == "ollama":
-            response = self._call_ollama(system_prompt, user_prompt)
+            call = self._astream_ollama if validate_response else self._acall_ollama
+            response = await self._acall_with_timeout(call, system_prompt, user_prompt, max_tokens)
         else:
             response = LLMResponse(content="", success=False, error="Unknown provider")
         
+        return self._finish_response(response, system_prompt, validate_response, cache_key, prompt_embedding)
+    
+    def _call_with_timeout(self, call, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """
+        Run a provider call with a hard deadline, retrying timeouts and rate limits with backoff
+        
+        Each attempt's deadline starts when a pool worker picks it up, so time spent
+        queued behind other calls doesn't count against it. A timed-out call can't be
+        interrupted: it keeps running (and holding its worker) until the provider
+        client's own timeout ends it.
+        """
+        response = LLMResponse(content="", success=False, error="LLM call timed out")
+        for attempt in range(config.llm.max_retries + 1):
+            started = threading.Event()
+            future = self._pool.submit(self._run_started, started, call, system_prompt, user_prompt, max_tokens)
+            try:
+                started.wait()
+                response = future.result(timeout=config.llm.timeout_seconds)
+                if not self._is_rate_limited(response):
+                    return response
+                logger.warning(f"LLM rate limited (attempt {attempt + 1}/{config.llm.max_retries + 1})")
+            except concurrent.futures.TimeoutError:
+                future.cancel()  # No-op if already running; the worker finishes in the background
+                logger.warning(f"LLM call timed out after {config.llm.timeout_seconds}s "
+                               f"(attempt {attempt + 1}/{config.llm.max_retries + 1})")
+            if attempt < config.llm.max_retries:
+                time.sleep(self._backoff_delay(attempt))
+        
+        return response
+    
+    @staticmethod
+    def _run_started(started: threading.Event, call, *args) -> LLMResponse:
+        """Pool task: signal that a worker picked the call up, then run it"""
+        started.set()
+        return call(*args)
+    
+    async def _acall_with_timeout(self, call, system_prompt: str, user_prompt: str, max_tokens: int) -> LLMResponse:
+        """
+        Async _call_with_timeout(); every attempt also waits for the requests-per-minute limiter
+        
+        A concurrency slot is held only while an attempt runs: not during the
+        limiter wait before it, nor the backoff sleep after it.
+        """
+        response = LLMResponse(content="", success=False, error="LLM call timed out")
+        for attempt in range(config.llm.max_retries + 1):
+            try:
+                async with self._rate_limiter:
+                    async with self._get_semaphore():
+                        response = await asyncio.wait_for(
+                            call(system_prompt, user_prompt, max_tokens),
+                            timeout=config.llm.timeout_seconds
+                        )
+                if not self._is_rate_limited(response):
+                    return response
+                logger.warning(f"LLM rate limited (attempt {attempt + 1}/{config.llm.max_retries + 1})")
+            except asyncio.TimeoutError:
+                logger.warning(f"LLM call timed out after {config.llm.timeout_seconds}s "
+                               f"(attempt {attempt + 1}/{config.llm.max_retries + 1})")
+            if attempt < config.llm.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt))
+        
+        return response
+    
+    @staticmethod
+    def _is_rate_limited(response: LLMResponse) -> bool:
+        """Whether a failed provider call was rejected for rate limiting (HTTP 429)"""
+        if response.success or not response.error:
+            return False
+        error = response.error.lower()
+        return "429" in error or "rate limit" in error or "ratelimit" in error
+    
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff with jitter, so retries from concurrent calls spread out"""
+        base = config.llm.retry_backoff_seconds * 2 ** attempt
+        return base + random.uniform(0, base)
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limit for the running event loop (asyncio primitives are loop-bound)"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(config.llm.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+    
+    def _check_caches(self, system_prompt: str, user_prompt: str, validate_response: bool,
+                      max_tokens: int) -> Tuple[Optional[LLMResponse], Optional[str], Any]:
+        """Look up the response caches; returns (cached response, cache key, prompt embedding)"""
+        cached, cache_key = self._check_exact_cache(system_prompt, user_prompt, max_tokens)
+        if cached is not None:
+            return cached, cache_key, None
+        
+        # Near-duplicate victim prompts can reuse an earlier reply
+        prompt_embedding = None
+        if validate_response and self.semantic_cache is not None:
+            prompt_embedding = self.semantic_cache.embed(user_prompt)
+            cached = self._check_semantic_cache(system_prompt, prompt_embedding)
+        return cached, cache_key, prompt_embedding
+    
+    async def _acheck_caches(self, system_prompt: str, user_prompt: str, validate_response: bool,
+                             max_tokens: int) -> Tuple[Optional[LLMResponse], Optional[str], Any]:
+        """Async _check_caches(): the SentenceTransformer encode runs off the event loop"""
+        cached, cache_key = self._check_exact_cache(system_prompt, user_prompt, max_tokens)
+        if cached is not None:
+            return cached, cache_key, None
+        
+        prompt_embedding = None
+        if validate_response and self.semantic_cache is not None:
+            prompt_embedding = await asyncio.to_thread(self.semantic_cache.embed, user_prompt)
+            cached = self._check_semantic_cache(system_prompt, prompt_embedding)
+        return cached, cache_key, prompt_embedding
+    
+    def _check_exact_cache(self, system_prompt: str, user_prompt: str,
+                           max_tokens: int) -> Tuple[Optional[LLMResponse], Optional[str]]:
+        """Look up the exact-match cache; returns (cached response, cache key)"""
+        logger.debug(f"LLM request: {truncate_text(user_prompt)}")
+        
+        cache_key = self._cache_key(system_prompt, user_prompt, max_tokens) if self.cache_enabled else None
+        if cache_key is not None:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                logger.debug("LLM response served from cache")
+                return LLMResponse(
+                    content=cached[0],
+                    success=True,
+                    tokens_used=cached[1],
+                    cached=True
+                ), cache_key
+        return None, cache_key
+    
+    def _check_semantic_cache(self, system_prompt: str, prompt_embedding: Any) -> Optional[LLMResponse]:
+        """Look up a reply to a near-duplicate prompt under the same system prompt"""
+        similar = self.semantic_cache.get(system_prompt, prompt_embedding)
+        if similar is None:
+            return None
+        logger.debug("LLM response served from semantic cache")
+        return LLMResponse(content=similar, success=True, cached=True)
+    
+    def _finish_response(self, response: LLMResponse, system_prompt: str, validate_response: bool,
+                         cache_key: Optional[str], prompt_embedding: Any) -> LLMResponse:
+        """Apply fallback and validation to a provider response, then cache it"""
         # Handle failures with fallback
         if not response.success:
             if config.llm.enable_fallback:
@@ -284,62 +935,257 @@ class LLMInterface:
                     response.success = False
                     response.error = error
         
+        # Only cache genuine model output that passed validation
+        if response.success and not response.used_fallback:
+            if cache_key is not None:
+                self._cache_put(cache_key, (response.content, response.tokens_used))
+            if prompt_embedding is not None:
+                self.semantic_cache.put(system_prompt, prompt_embedding, response.content)
+        
         logger.debug(f"LLM response: {truncate_text(response.content)}")
         return response
     
     def detect_scam(self, message: str) -> Dict[str, Any]:
-        """Use LLM to detect if message is a scam"""
-        user_prompt = f"Analyze this message for scam indicators:\n\n{message}"
+        """Use LLM to detect if message is a scam (the local classifier answers confident cases)"""
+        local_result = local_classifier.predict(message)
+        if local_result is not None:
+            return local_result
         
         response = self.generate(
             system_prompt=PromptGuardrails.SCAM_DETECTION_SYSTEM_PROMPT,
-            user_prompt=user_prompt,
+            user_prompt=self._detection_prompt(message),
             validate_response=False
         )
+        return self._parse_and_record_detection(message, response)
+    
+    async def adetect_scam(self, message: str) -> Dict[str, Any]:
+        """Async detect_scam()"""
+        local_result = local_classifier.predict(message)
+        if local_result is not None:
+            return local_result
         
-        if not response.success:
+        response = await self.agenerate(
+            system_prompt=PromptGuardrails.SCAM_DETECTION_SYSTEM_PROMPT,
+            user_prompt=self._detection_prompt(message),
+            validate_response=False
+        )
+        return await self._aparse_and_record_detection(message, response)
+    
+    def _parse_and_record_detection(self, message: str, response: LLMResponse) -> Dict[str, Any]:
+        """
+        Parse a detection response and log genuine model verdicts for the local classifier
+        
+        The result carries "parsed" and "used_fallback" so callers can tell a
+        real verdict from a failed call (e.g. to keep it out of their caches).
+        """
+        result, record = self._tag_detection(response)
+        if record:
+            local_classifier.record(message, result)
+        return result
+    
+    async def _aparse_and_record_detection(self, message: str, response: LLMResponse) -> Dict[str, Any]:
+        """Async _parse_and_record_detection(); the log append runs off the event loop"""
+        result, record = self._tag_detection(response)
+        if record and local_classifier.enabled:
+            await asyncio.to_thread(local_classifier.record, message, result)
+        return result
+    
+    def _tag_detection(self, response: LLMResponse) -> Tuple[Dict[str, Any], bool]:
+        """Parse a detection response and tag it; the flag says whether to log it for the local classifier"""
+        result, parsed = self._parse_detection(response)
+        result["parsed"] = parsed
+        result["used_fallback"] = response.used_fallback
+        return result, parsed and not response.used_fallback and not response.cached
+    
+    @staticmethod
+    def _detection_prompt(message: str) -> str:
+        """Build the scam detection user prompt"""
+        return f"Analyze this message for scam indicators:\n\n{message}"
+    
+    @staticmethod
+    def _parse_detection(response: LLMResponse) -> Tuple[Dict[str, Any], bool]:
+        """Parse a scam detection response; the flag is True when the model returned a JSON object"""
+        if not response.success or response.used_fallback:
             # Return conservative result on failure
             return {
                 "is_scam": False,
                 "confidence": 0.0,
                 "scam_type": "unknown",
-                "reasoning": "LLM analysis failed"
-            }
+                "reasoning": DETECTION_FAILED_REASONING
+            }, False
         
         # Parse JSON response
         try:
-            import json
-            result = json.loads(response.content)
-            return result
-        except:
-            # Fallback parsing
-            return {
-                "is_scam": "scam" in response.content.lower(),
-                "confidence": 0.5,
-                "scam_type": "unknown",
-                "reasoning": response.content
-            }
+            result = orjson.loads(_strip_code_fences(response.content))
+        except orjson.JSONDecodeError:
+            result = None
+        if isinstance(result, dict):
+            return result, True
+        
+        # Fallback parsing (not JSON, or JSON that isn't an object)
+        return {
+            "is_scam": "scam" in response.content.lower(),
+            "confidence": 0.5,
+            "scam_type": "unknown",
+            "reasoning": response.content
+        }, False
+    
+    def detect_scam_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Classify several messages with one LLM call per config.llm.detection_batch_size messages"""
+        results, pending = self._local_detections(messages)
+        for batch in self._detection_batches(pending):
+            batch_messages = [messages[i] for i in batch]
+            response = self.generate(
+                system_prompt=PromptGuardrails.SCAM_DETECTION_BATCH_SYSTEM_PROMPT,
+                user_prompt=self._batch_detection_prompt(batch_messages),
+                validate_response=False,
+                max_tokens=config.llm.max_tokens * len(batch)
+            )
+            for i, result in zip(batch, self._parse_and_record_detection_batch(batch_messages, response)):
+                results[i] = result
+        return results
+    
+    async def adetect_scam_batch(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """Async detect_scam_batch(); batches are sent concurrently"""
+        results, pending = self._local_detections(messages)
+        batches = [[messages[i] for i in batch] for batch in self._detection_batches(pending)]
+        responses = await asyncio.gather(*(
+            self.agenerate(
+                system_prompt=PromptGuardrails.SCAM_DETECTION_BATCH_SYSTEM_PROMPT,
+                user_prompt=self._batch_detection_prompt(batch_messages),
+                validate_response=False,
+                max_tokens=config.llm.max_tokens * len(batch_messages)
+            )
+            for batch_messages in batches
+        ))
+        batch_results, to_record = [], []
+        for batch_messages, response in zip(batches, responses):
+            tagged, batch_record = self._tag_detection_batch(batch_messages, response)
+            batch_results.extend(tagged)
+            to_record.extend(batch_record)
+        if to_record and local_classifier.enabled:
+            # One worker-thread hop for the whole batch keeps the log appends off the event loop
+            await asyncio.to_thread(self._record_detections, to_record)
+        for i, result in zip(pending, batch_results):
+            results[i] = result
+        return results
     
-    def generate_victim_response(self, persona_context: str, 
-                                 conversation_history: List[Dict[str, str]],
-                                 scammer_message: str) -> LLMResponse:
-        """Generate victim response with strict guardrails"""
+    @staticmethod
+    def _local_detections(messages: List[str]) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """Answer what the local classifier can; returns the results so far and the indices left for the LLM"""
+        results = [local_classifier.predict(message) for message in messages]
+        return results, [i for i, result in enumerate(results) if result is None]
+    
+    @staticmethod
+    def _detection_batches(items: List[Any]) -> List[List[Any]]:
+        """Split items into detection batches"""
+        size = max(1, config.llm.detection_batch_size)
+        return [items[i:i + size] for i in range(0, len(items), size)]
+    
+    def _parse_and_record_detection_batch(self, messages: List[str],
+                                          response: LLMResponse) -> List[Dict[str, Any]]:
+        """Batch counterpart of _parse_and_record_detection()"""
+        results, to_record = self._tag_detection_batch(messages, response)
+        self._record_detections(to_record)
+        return results
+    
+    def _tag_detection_batch(self, messages: List[str], response: LLMResponse
+                             ) -> Tuple[List[Dict[str, Any]], List[Tuple[str, Dict[str, Any]]]]:
+        """Batch counterpart of _tag_detection(); returns the results and the (message, result) pairs to log"""
+        results, to_record = [], []
+        for message, (result, parsed) in zip(messages, self._parse_detection_batch(response, len(messages))):
+            if parsed and not response.cached:
+                to_record.append((message, result))
+            result["parsed"] = parsed
+            result["used_fallback"] = response.used_fallback
+            results.append(result)
+        return results, to_record
+    
+    @staticmethod
+    def _record_detections(entries: List[Tuple[str, Dict[str, Any]]]):
+        """Log (message, result) pairs for the local classifier"""
+        for message, result in entries:
+            local_classifier.record(message, result)
+    
+    @staticmethod
+    def _batch_detection_prompt(messages: List[str]) -> str:
+        """Build the numbered batch detection user prompt"""
+        numbered = "\n\n".join(f"[{i}] {message}" for i, message in enumerate(messages, 1))
+        return f"Analyze each of these {len(messages)} messages for scam indicators:\n\n{numbered}"
+    
+    @staticmethod
+    def _parse_detection_batch(response: LLMResponse, count: int) -> List[Tuple[Dict[str, Any], bool]]:
+        """Parse a batch detection response; messages missing from it get the conservative result (flag False)"""
+        failed = {
+            "is_scam": False,
+            "confidence": 0.0,
+            "scam_type": "unknown",
+            "reasoning": DETECTION_FAILED_REASONING
+        }
+        if not response.success or response.used_fallback:
+            return [(dict(failed), False) for _ in range(count)]
         
-        # Build conversation context
-        history_text = "\n".join([
-            f"{'Scammer' if msg['role'] == 'scammer' else 'You'}: {msg['content']}"
-            for msg in conversation_history[-5:]  # Last 5 messages for context
-        ])
+        try:
+            items = orjson.loads(_strip_code_fences(response.content))
+        except orjson.JSONDecodeError:
+            logger.warning("Batch detection response was not valid JSON")
+            return [(dict(failed), False) for _ in range(count)]
         
-        user_prompt = f"""PERSONA:
-{persona_context}
-
-CONVERSATION SO FAR:
+        by_index = {}
+        if isinstance(items, list):
+            for item in items:
+                if isinstance(item, dict) and isinstance(item.get("idx"), int):
+                    by_index[item["idx"]] = item
+        
+        return [(by_index[i], True) if i in by_index else (dict(failed), False) for i in range(1, count + 1)]
+    
+    @staticmethod
+    def build_victim_system_prompt(persona_context: str) -> str:
+        """
+        Build the victim system prompt for a conversation
+        
+        Guardrails plus persona are fixed for a whole conversation, so they form
+        a byte-identical prefix every turn (reusable by provider prompt caches
+        and Ollama's KV cache); only the user prompt varies.
+        """
+        return f"{PromptGuardrails.VICTIM_PERSONA_SYSTEM_PROMPT}\nPERSONA:\n{persona_context}"
+    
+    def generate_victim_response(self, system_prompt: str,
+                                 conversation_history: Sequence[Dict[str, str]],
+                                 scammer_message: str, guidance: str = "") -> LLMResponse:
+        """Generate victim response with strict guardrails (system_prompt from build_victim_system_prompt)"""
+        return self.generate(
+            system_prompt=system_prompt,
+            user_prompt=self._victim_prompt(conversation_history, scammer_message, guidance),
+            validate_response=True
+        )
+    
+    async def agenerate_victim_response(self, system_prompt: str,
+                                        conversation_history: Sequence[Dict[str, str]],
+                                        scammer_message: str, guidance: str = "") -> LLMResponse:
+        """Async generate_victim_response()"""
+        return await self.agenerate(
+            system_prompt=system_prompt,
+            user_prompt=self._victim_prompt(conversation_history, scammer_message, guidance),
+            validate_response=True
+        )
+    
+    @staticmethod
+    def _victim_prompt(conversation_history: Sequence[Dict[str, str]], scammer_message: str,
+                       guidance: str = "") -> str:
+        """Build the per-turn victim user prompt: history, latest message, turn-specific guidance"""
+        # Build conversation context (callers pass only the recent window)
+        history_text = "\n".join(
+            f"{_ROLE_LABELS.get(msg['role'], 'You')}: {msg['content']}"
+            for msg in conversation_history
+        )
+        
+        return f"""CONVERSATION SO FAR:
 {history_text}
 
 SCAMMER'S LATEST MESSAGE:
 {scammer_message}
-
+{guidance}
 Respond as your persona. IMPORTANT:
 - If this is your FIRST message, introduce yourself with your name and share relevant personal details
 - Show EAGERNESS by volunteering why you're interested (need money, need job, etc.)
@@ -347,12 +1193,6 @@ Respond as your persona. IMPORTANT:
 - Act trusting and slightly naive, not overly cautious
 - Keep it natural and conversational (2-4 sentences)"""
 
-        return self.generate(
-            system_prompt=PromptGuardrails.VICTIM_PERSONA_SYSTEM_PROMPT,
-            user_prompt=user_prompt,
-            validate_response=True
-        )
-
 
 # Global LLM interface instance
 llm = LLMInterface()
@@ -0,0 +1,133 @@
+"""
+Local Scam Classifier Trained on Past LLM Detections
+Skips the LLM scam-detection call for messages it can classify confidently
+"""
+
+import os
+from typing import Dict, Any, List, Optional
+import orjson
+from config import config
+from utils import logger
+
+
+# Label used for messages the LLM judged legitimate
+NOT_SCAM_LABEL = "not_scam"
+
+
+class LocalScamClassifier:
+    """
+    Logistic classifier over hashed n-grams, trained from the detection log
+
+    Every genuine LLM detection is appended to a JSONL log. At startup (and on
+    retrain()) a HashingVectorizer + SGDClassifier is fitted on it; a message
+    whose top class probability clears the threshold is answered locally in
+    the same shape as LLMInterface.detect_scam. Requires scikit-learn; without
+    it, or with too little data, every message goes to the LLM.
+    """
+
+    MIN_TRAINING_SAMPLES = 50
+
+    def __init__(self):
+        self.enabled = config.llm.local_classifier
+        self.log_path = config.llm.local_classifier_log_path
+        self.threshold = config.llm.local_classifier_threshold
+        self._vectorizer = None
+        self._model = None
+
+        if self.enabled:
+            self.retrain()
+
+    def retrain(self) -> bool:
+        """Fit the classifier on the detection log; returns whether a model is active"""
+        try:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            from sklearn.linear_model import SGDClassifier
+        except ImportError:
+            logger.warning("Local scam classifier disabled (install scikit-learn)")
+            self.enabled = False
+            return False
+
+        messages, labels = self._load_log()
+        if len(messages) < self.MIN_TRAINING_SAMPLES or len(set(labels)) < 2:
+            logger.info(f"Local scam classifier not trained yet ({len(messages)} logged detections)")
+            return False
+
+        vectorizer = HashingVectorizer(n_features=2 ** 18, ngram_range=(1, 2), alternate_sign=False)
+        model = SGDClassifier(loss="log_loss", random_state=0)
+        model.fit(vectorizer.transform(messages), labels)
+
+        self._vectorizer, self._model = vectorizer, model
+        logger.info(f"Local scam classifier trained on {len(messages)} detections")
+        return True
+
+    def predict(self, message: str) -> Optional[Dict[str, Any]]:
+        """Classify locally, or return None when not confident enough"""
+        if self._model is None:
+            return None
+
+        probabilities = self._model.predict_proba(self._vectorizer.transform([message]))[0]
+        best = int(probabilities.argmax())
+        confidence = float(probabilities[best])
+        if confidence < self.threshold:
+            return None
+
+        label = str(self._model.classes_[best])
+        is_scam = label != NOT_SCAM_LABEL
+        return {
+            "is_scam": is_scam,
+            "confidence": confidence,
+            "scam_type": label if is_scam else "unknown",
+            "reasoning": "Local classifier trained on past LLM detections"
+        }
+
+    def record(self, message: str, result: Dict[str, Any]):
+        """Append an LLM detection result to the training log"""
+        if not self.enabled:
+            return
+
+        label = self._scam_label(result.get("scam_type")) if result.get("is_scam") else NOT_SCAM_LABEL
+        try:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, "ab") as f:
+                f.write(orjson.dumps({"message": message, "label": label}) + b"\n")
+        except OSError as e:
+            logger.warning(f"Could not write detection log: {e}")
+
+    @staticmethod
+    def _scam_label(scam_type: Any) -> str:
+        """Training label for an LLM scam_type: a known scam ScamType value, else unknown"""
+        # Imported here: scam_detector imports llm_interface, which imports this module
+        from scam_detector import ScamType
+
+        if isinstance(scam_type, str) and scam_type != NOT_SCAM_LABEL:
+            try:
+                return ScamType(scam_type).value
+            except ValueError:
+                pass
+        return ScamType.UNKNOWN.value
+
+    def _load_log(self) -> tuple[List[str], List[str]]:
+        """Read (messages, labels) from the detection log"""
+        messages, labels = [], []
+        if not os.path.exists(self.log_path):
+            return messages, labels
+
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # Skip a partially written line
+                if not isinstance(entry, dict):
+                    continue
+                message, label = entry.get("message"), entry.get("label")
+                if isinstance(message, str) and isinstance(label, str):
+                    messages.append(message)
+                    labels.append(label)
+        return messages, labels
+
+
+# Global local classifier instance
+local_classifier = LocalScamClassifier()
@@ -4,10 +4,11 @@ Orchestrates the entire workflow
 """
 
 import sys
-from typing import Optional
+import asyncio
+from typing import List, Optional
 from utils import logger
 from config import config
-from scam_detector import detector
+from scam_detector import detector, ScamDetectionResult
 from conversation_agent import agent
 from report_generator import report_gen
 from strategy_engine import StopReason
@@ -33,7 +34,8 @@ class HoneypotSystem:
         logger.info(f"Max Messages: {config.engagement.max_messages}")
         self.initialized = True
     
-    def process_message(self, message: str, sender: Optional[str] = None, scammer_callback=None) -> dict:
+    async def process_message(self, message: str, sender: Optional[str] = None, scammer_callback=None,
+                              detection_result: Optional[ScamDetectionResult] = None) -> dict:
         """
         Process incoming message through honeypot pipeline
         
@@ -41,6 +43,7 @@ class HoneypotSystem:
             message: The message to analyze
             sender: Optional sender identifier
             scammer_callback: Optional callback function for multi-turn conversations
+            detection_result: Precomputed detection (from process_batch); skips Step 1
         
         Returns:
             Dictionary with processing results
@@ -54,7 +57,8 @@ class HoneypotSystem:
         
         # Step 1: Scam Detection
         logger.info("Step 1: Scam Detection")
-        detection_result = detector.detect(message, sender)
+        if detection_result is None:
+            detection_result = await detector.adetect(message, sender)
         
         logger.info(f"Detection: is_scam={detection_result.is_scam}, "
                    f"confidence={detection_result.confidence:.2f}, "
@@ -80,7 +84,7 @@ class HoneypotSystem:
         # Step 3: Conversation Loop
         logger.info("Step 3: Starting Conversation Loop")
         
-        conversation_results = self._conversation_loop(message, scammer_callback)
+        conversation_results = await self._conversation_loop(message, scammer_callback)
         
         # Step 4: Generate Report
         logger.info("Step 4: Generating Intelligence Report")
@@ -89,10 +93,12 @@ class HoneypotSystem:
             stop_reason=conversation_results.get("stop_reason")
         )
         
-        # Export report
+        # Export report (both files written concurrently, off the event loop)
         report_id = report['report_metadata']['report_id']
-        report_gen.export_json(report, f"report_{report_id}.json")
-        report_gen.export_markdown(report, f"report_{report_id}.md")
+        await asyncio.gather(
+            asyncio.to_thread(report_gen.export_json, report, f"report_{report_id}.json"),
+            asyncio.to_thread(report_gen.export_markdown, report, f"report_{report_id}.md")
+        )
         
         logger.info("="*60)
         logger.info("Honeypot processing complete")
@@ -111,7 +117,7 @@ class HoneypotSystem:
             }
         }
     
-    def _conversation_loop(self, initial_message: str, scammer_callback=None) -> dict:
+    async def _conversation_loop(self, initial_message: str, scammer_callback=None) -> dict:
         """
         Run conversation loop with scammer.
         
@@ -127,7 +133,7 @@ class HoneypotSystem:
         stop_reason = StopReason.MAX_MESSAGES  # Default stop reason
 
         # Generate first response
-        victim_response = agent.generate_response(initial_message)
+        victim_response = await agent.generate_response(initial_message)
         messages_exchanged += 1
         
         if victim_response:
@@ -153,7 +159,7 @@ class HoneypotSystem:
             logger.info(f"Scammer: {scammer_message}")
             agent.add_message("scammer", scammer_message) # Add scammer's message to conversation history
 
-            victim_response = agent.generate_response(scammer_message)
+            victim_response = await agent.generate_response(scammer_message)
             messages_exchanged += 1
             
             if victim_response is None: # Agent decided to stop
@@ -168,6 +174,23 @@ class HoneypotSystem:
             "last_victim_response": victim_response
         }
     
+    async def process_batch(self, messages: List[str],
+                            senders: Optional[List[Optional[str]]] = None) -> List[dict]:
+        """
+        Process several independent messages (no scammer callback)
+        
+        Scam detection for all of them shares batched LLM calls; each detected
+        scam then runs through the rest of the pipeline in turn, since the
+        conversation state is shared.
+        """
+        senders = senders or [None] * len(messages)
+        detection_results = await detector.adetect_batch(messages, senders)
+        
+        results = []
+        for message, sender, detection_result in zip(messages, senders, detection_results):
+            results.append(await self.process_message(message, sender, detection_result=detection_result))
+        return results
+    
     def run_interactive_demo(self):
         """Run interactive demo mode"""
         print("="*60)
@@ -179,6 +202,13 @@ class HoneypotSystem:
         print("="*60)
         print("\nEnter a message to analyze (or 'quit' to exit):\n")
         
+        # One event loop for the whole session: async LLM clients (e.g. the
+        # Gemini SDK's) keep connections bound to the loop they were first used on
+        with asyncio.Runner() as runner:
+            self._demo_loop(runner)
+    
+    def _demo_loop(self, runner: asyncio.Runner):
+        """Read and process demo messages until the user quits"""
         while True:
             try:
                 message = input("📨 Message: ").strip()
@@ -191,7 +221,7 @@ class HoneypotSystem:
                     continue
                 
                 # Process message
-                result = self.process_message(message)
+                result = runner.run(self.process_message(message))
                 
                 # Display results
                 print("\n" + "="*60)
@@ -234,7 +264,7 @@ def main():
         else:
             # Process single message from command line
             message = " ".join(sys.argv[1:])
-            result = honeypot.process_message(message)
+            result = asyncio.run(honeypot.process_message(message))
             print(f"\nHoneypot Activated: {result['honeypot_activated']}")
             if result['honeypot_activated']:
                 print(f"Report: {result['report_files']['markdown']}")
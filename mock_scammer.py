@@ -5,8 +5,10 @@ Simulates various scam types for testing the honeypot
 
 import sys
 import random
+import asyncio
 from typing import List, Dict, Optional
 from scam_detector import ScamType
+from utils import KeywordMatcher
 
 
 class MockScammer:
@@ -42,11 +44,29 @@ class MockScammer:
         ],
     }
     
-    def __init__(self, scam_type: ScamType):
+    # Words in a victim reply that make the scammer suspicious (one automaton pass)
+    SUSPICIOUS_KEYWORDS = KeywordMatcher(['verify', 'proof', 'documentation', 'legal', 'police'])
+    
+    # Replies once the scammer is suspicious
+    SUSPICIOUS_REPLIES = (
+        "Are you real? Send me a voice message.",
+        "Why are you asking so many questions?",
+        "This is taking too long. Never mind.",
+    )
+    
+    # Replies after the script is exhausted
+    FOLLOW_UP_REPLIES = (
+        "So are you interested or not?",
+        "Please send the payment soon.",
+        "Let me know if you want to proceed.",
+    )
+    
+    def __init__(self, scam_type: ScamType, seed: Optional[int] = None):
         self.scam_type = scam_type
         self.script = self.SCAM_SCRIPTS.get(scam_type, [])
         self.message_index = 0
         self.suspicious = False
+        self._rng = random.Random(seed)  # Per-instance so seeded runs are reproducible
     
     def get_next_message(self, victim_response: str = "") -> str:
         """Get next message from scammer"""
@@ -57,11 +77,7 @@ class MockScammer:
         
         # If suspicious, change behavior
         if self.suspicious:
-            return random.choice([
-                "Are you real? Send me a voice message.",
-                "Why are you asking so many questions?",
-                "This is taking too long. Never mind.",
-            ])
+            return self._rng.choice(self.SUSPICIOUS_REPLIES)
         
         # Get next scripted message
         if self.message_index < len(self.script):
@@ -70,28 +86,25 @@ class MockScammer:
             return message
         else:
             # Script exhausted, repeat last message or end
-            return random.choice([
-                "So are you interested or not?",
-                "Please send the payment soon.",
-                "Let me know if you want to proceed.",
-            ])
+            return self._rng.choice(self.FOLLOW_UP_REPLIES)
     
     def _analyze_victim_response(self, response: str):
         """Analyze victim response for suspicion indicators"""
+        if self.suspicious:
+            return  # Once suspicious, stays suspicious
         
-        # Scammer gets suspicious if victim asks too many questions
-        question_count = response.count('?')
-        if question_count >= 3:
+        # Suspicious keywords
+        if self.SUSPICIOUS_KEYWORDS.find_all(response.casefold()):
             self.suspicious = True
+            return
         
-        # Suspicious keywords
-        suspicious_keywords = ['verify', 'proof', 'documentation', 'legal', 'police']
-        if any(kw in response.lower() for kw in suspicious_keywords):
+        # Scammer gets suspicious if victim asks too many questions
+        if response.count('?') >= 3:
             self.suspicious = True
 
 
-def run_mock_conversation(scam_type: ScamType):
-    """Run a mock conversation for testing"""
+def run_mock_conversation(scam_type: ScamType, runner: Optional[asyncio.Runner] = None):
+    """Run a mock conversation for testing (on runner's event loop when given)"""
     from main import HoneypotSystem
     
     print(f"\n{'='*60}")
@@ -123,10 +136,11 @@ def run_mock_conversation(scam_type: ScamType):
         return next_message
     
     # Process through honeypot with callback
-    result = honeypot.process_message(
+    conversation = honeypot.process_message(
         initial_message, 
         scammer_callback=scammer_callback
     )
+    result = runner.run(conversation) if runner is not None else asyncio.run(conversation)
     
     if not result['honeypot_activated']:
         print("❌ [FAIL] Honeypot did NOT activate (false negative!)\n")
@@ -154,8 +168,9 @@ def run_mock_conversation(scam_type: ScamType):
 
 
 if __name__ == "__main__":
-    # Test all scam types
-    for scam_type in [ScamType.JOB_SCAM, ScamType.INVESTMENT_SCAM, 
-                      ScamType.BANKING_FRAUD, ScamType.PRIZE_LOTTERY]:
-        run_mock_conversation(scam_type)
-        print("\n" + "="*80 + "\n")
+    # Test all scam types, on one event loop so async LLM clients stay usable
+    with asyncio.Runner() as runner:
+        for scam_type in [ScamType.JOB_SCAM, ScamType.INVESTMENT_SCAM, 
+                          ScamType.BANKING_FRAUD, ScamType.PRIZE_LOTTERY]:
+            run_mock_conversation(scam_type, runner)
+            print("\n" + "="*80 + "\n")
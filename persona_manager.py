@@ -3,15 +3,64 @@ Persona Management with Locked Attributes and Conversation Memory
 Addresses Drawbacks #2, #4: AI Behavior & Persona Consistency
 """
 
+import re
 import json
-from typing import Dict, Any, List, Optional
+import time
+import random
+import itertools
+from collections import deque
+from typing import Dict, Any, List, Optional, Set
 from dataclasses import dataclass, field
 from enum import Enum
 from config import config
-from utils import logger
+from utils import logger, KeywordMatcher
 from scam_detector import ScamType
 
 
+# Bound once; get_typing_delay runs every turn
+_rand = random.random
+
+# Messages of history included in each victim prompt
+RECENT_CONTEXT_SIZE = 5
+
+# Up to four words; bounded so long messages can't cause runaway backtracking.
+# Persona patterns are lowercase and run on message.lower() (no IGNORECASE folding).
+_WORDS = r"[a-z]+(?:\s+[a-z]+){0,3}"
+
+# Self-descriptions like "I am...", "My...", "I have..." in victim messages
+_PERSONA_STATEMENT_RES = [re.compile(pattern) for pattern in (
+    r"\bi am (\d+) years? old\b",
+    rf"\bi(?:'m| am) (?:a |an )?({_WORDS})\b",
+    rf"\bmy ({_WORDS}) is ({_WORDS})\b",
+    rf"\bi (?:live|work) in ({_WORDS})\b",
+    rf"\bi have ({_WORDS})\b",
+)]
+
+# Lowercase phrases that start each persona statement pattern (indices into _PERSONA_STATEMENT_RES)
+_STATEMENT_TRIGGERS = {
+    "i am": (0, 1),
+    "i'm": (1,),
+    "my": (2,),
+    "i live in": (3,),
+    "i work in": (3,),
+    "i have": (4,),
+}
+_STATEMENT_TRIGGER_MATCHER = KeywordMatcher(_STATEMENT_TRIGGERS)
+
+# Persona facts checked by ConversationMemory.check_consistency, found in one scan.
+# The lookahead makes matches zero-width so overlapping facts are all reported;
+# "I am in X" is read as a location before the generic "I am X" occupation form.
+_CONSISTENCY_RE = re.compile(
+    r"(?=\bi am (?P<age>\d+) years? old\b"
+    rf"|\bi (?:live|am) in (?P<location>{_WORDS})\b"
+    rf"|\bi(?:'m| am) (?:a |an )?(?P<occupation>{_WORDS})\b"
+    rf"|\bi work as (?:a |an )?(?P<work_as>{_WORDS})\b)"
+)
+
+# Literal openings of every _CONSISTENCY_RE alternative; most replies contain none
+_CONSISTENCY_TRIGGERS = ("i am ", "i'm ", "i live in ", "i work as ")
+
+
 class PersonaType(Enum):
     """Types of vulnerable personas"""
     ELDERLY = "elderly"
@@ -21,7 +70,7 @@ class PersonaType(Enum):
     STUDENT = "student"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PersonaProfile:
     """Immutable persona attributes"""
     persona_type: PersonaType
@@ -40,8 +89,38 @@ class PersonaProfile:
     makes_typos: bool = True
     uses_emojis: bool = False
     
+    # Rendered context, built on first use (profiles are fixed PERSONAS entries)
+    _context_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    seconds_per_char: float = field(init=False, repr=False, compare=False)
+    
+    # Lowercased facts compared by ConversationMemory.check_consistency
+    _occupation_lc: str = field(init=False, repr=False, compare=False)
+    _location_lc: str = field(init=False, repr=False, compare=False)
+    _occupation_variations: frozenset = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Frozen dataclass: derived fields are set through object.__setattr__
+        # Average 5 characters per word
+        object.__setattr__(self, "seconds_per_char", 60.0 / (self.max_typing_speed_wpm * 5))
+        
+        occupation_lc = self.occupation.lower()
+        object.__setattr__(self, "_occupation_lc", occupation_lc)
+        object.__setattr__(self, "_location_lc", self.location.lower())
+        # Allow variations like "retired X" or "former X"
+        object.__setattr__(self, "_occupation_variations", frozenset((
+            f"retired {occupation_lc}",
+            f"former {occupation_lc}",
+            occupation_lc
+        )))
+    
     def to_context_string(self) -> str:
         """Convert persona to context string for LLM"""
+        if self._context_cache is None:
+            object.__setattr__(self, "_context_cache", self._render_context())
+        return self._context_cache
+    
+    def _render_context(self) -> str:
+        """Build the persona context string"""
         return f"""You are {self.name}, a {self.age}-year-old {self.occupation} from {self.location}.
 
 BACKGROUND:
@@ -68,85 +147,107 @@ CRITICAL: In your FIRST response, naturally introduce yourself by mentioning:
 REMEMBER: You must stay consistent with these facts throughout the conversation."""
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationMemory:
     """Tracks conversation history and persona statements"""
-    messages: List[Dict[str, str]] = field(default_factory=list)
+    # Full history, capped at config.persona.max_memory_items (oldest messages are evicted)
+    messages: deque = field(default_factory=lambda: deque(maxlen=config.persona.max_memory_items))
+    # Rolling window of the latest messages, so prompt context needs no slicing
+    recent_messages: deque = field(default_factory=lambda: deque(maxlen=RECENT_CONTEXT_SIZE))
     persona_statements: List[str] = field(default_factory=list)  # Facts stated by persona
+    _statement_set: Set[str] = field(default_factory=set, repr=False)  # Membership index for persona_statements
     extracted_entities: List[Dict[str, Any]] = field(default_factory=list)
     
     def add_message(self, role: str, content: str):
         """Add message to history"""
-        self.messages.append({
+        message = {
             "role": role,
             "content": content,
-            "timestamp": self._get_timestamp()
-        })
+            "timestamp": time.time_ns()  # Formatted when the report transcript is built
+        }
+        self.messages.append(message)
+        self.recent_messages.append(message)
         
         # Extract persona statements (things persona said about themselves)
         if role == "victim":
             self._extract_persona_statements(content)
     
-    def _get_timestamp(self) -> str:
-        """Get current timestamp"""
-        from datetime import datetime
-        return datetime.utcnow().isoformat() + 'Z'
-    
     def _extract_persona_statements(self, message: str):
         """Extract factual statements persona made about themselves"""
         # Look for patterns like "I am...", "My...", "I have...", etc.
-        patterns = [
-            r"I am (\d+) years? old",
-            r"I(?:'m| am) (?:a |an )?([a-zA-Z\s]+)",
-            r"My ([a-zA-Z\s]+) is ([a-zA-Z\s]+)",
-            r"I (?:live|work) in ([a-zA-Z\s]+)",
-            r"I have ([a-zA-Z\s]+)",
-        ]
+        for groups in self._statement_matches(message):
+            statement = f"Stated: {' '.join(groups)}"
+            if statement not in self._statement_set:
+                self._statement_set.add(statement)
+                self.persona_statements.append(statement)
+    
+    @staticmethod
+    def _statement_matches(message: str):
+        """Yield the captures of each persona statement, running each pattern only where a trigger phrase starts"""
+        text = message.lower()
+        if len(text) != len(message):
+            # Lowercasing shifted character offsets; scan the whole text with every pattern
+            for pattern in _PERSONA_STATEMENT_RES:
+                for match in pattern.finditer(text):
+                    yield match.groups()
+            return
+        
+        starts = [[] for _ in _PERSONA_STATEMENT_RES]
+        for start, trigger in _STATEMENT_TRIGGER_MATCHER.find_positions(text):
+            for index in _STATEMENT_TRIGGERS[trigger]:
+                starts[index].append(start)
         
-        import re
-        for pattern in patterns:
-            matches = re.findall(pattern, message, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    statement = f"Stated: {match if isinstance(match, str) else ' '.join(match)}"
-                    if statement not in self.persona_statements:
-                        self.persona_statements.append(statement)
+        # Same matches, in the same order, as pattern.findall(text) for each pattern
+        for pattern, positions in zip(_PERSONA_STATEMENT_RES, starts):
+            end = 0
+            for start in sorted(positions):
+                if start < end:
+                    continue
+                match = pattern.match(text, start)
+                if match:
+                    end = match.end()
+                    # Offsets line up with the message, so keep the statement's original casing
+                    yield tuple(message[match.start(i):match.end(i)] for i in range(1, pattern.groups + 1))
     
-    def get_recent_messages(self, count: int = 5) -> List[Dict[str, str]]:
-        """Get recent messages for context"""
-        return self.messages[-count:]
+    def get_recent_messages(self, count: int = RECENT_CONTEXT_SIZE) -> List[Dict[str, Any]]:
+        """Get recent messages for context (a snapshot; later messages don't change it)"""
+        if count == RECENT_CONTEXT_SIZE:
+            return list(self.recent_messages)
+        return list(itertools.islice(self.messages, max(0, len(self.messages) - count), None))
     
     def check_consistency(self, new_statement: str, persona: PersonaProfile) -> tuple[bool, Optional[str]]:
         """Check if new statement is consistent with persona and history"""
         
+        # Substring checks are far cheaper than a regex scan that finds nothing
+        text = new_statement.lower()
+        if not any(trigger in text for trigger in _CONSISTENCY_TRIGGERS):
+            return True, None
+        
+        # First statement of each kind, in one pass over the message
+        stated = {}
+        for match in _CONSISTENCY_RE.finditer(text):
+            stated.setdefault(match.lastgroup, match.group(match.lastgroup))
+        
         # Check age consistency
-        import re
-        age_match = re.search(r"I am (\d+) years? old", new_statement, re.IGNORECASE)
-        if age_match:
-            stated_age = int(age_match.group(1))
+        if "age" in stated:
+            stated_age = int(stated["age"])
             if stated_age != persona.age:
                 return False, f"Age inconsistency: persona is {persona.age} but stated {stated_age}"
         
         # Check occupation consistency
-        occupation_patterns = [
-            r"I(?:'m| am) (?:a |an )?([a-zA-Z\s]+)",
-            r"I work as (?:a |an )?([a-zA-Z\s]+)"
-        ]
-        for pattern in occupation_patterns:
-            match = re.search(pattern, new_statement, re.IGNORECASE)
-            if match:
-                stated_occupation = match.group(1).strip().lower()
+        for kind in ("occupation", "work_as"):
+            if kind in stated:
+                stated_occupation = stated[kind]
                 # Allow some variation (e.g., "retired teacher" vs "teacher")
-                if persona.occupation.lower() not in stated_occupation and stated_occupation not in persona.occupation.lower():
+                if persona._occupation_lc not in stated_occupation and stated_occupation not in persona._occupation_lc:
                     # Check if it's a reasonable variation
-                    if not self._is_reasonable_occupation_variation(persona.occupation, stated_occupation):
+                    if not self._is_reasonable_occupation_variation(persona, stated_occupation):
                         return False, f"Occupation inconsistency: persona is {persona.occupation} but stated {stated_occupation}"
         
         # Check location consistency
-        location_match = re.search(r"I (?:live|am) in ([a-zA-Z\s]+)", new_statement, re.IGNORECASE)
-        if location_match:
-            stated_location = location_match.group(1).strip().lower()
-            if persona.location.lower() not in stated_location and stated_location not in persona.location.lower():
+        if "location" in stated:
+            stated_location = stated["location"]
+            if persona._location_lc not in stated_location and stated_location not in persona._location_lc:
                 return False, f"Location inconsistency: persona is in {persona.location} but stated {stated_location}"
         
         # Check against previous statements
@@ -156,15 +257,17 @@ class ConversationMemory:
         
         return True, None
     
-    def _is_reasonable_occupation_variation(self, original: str, stated: str) -> bool:
-        """Check if occupation variation is reasonable"""
-        # Allow variations like "retired X" or "former X"
-        variations = [
-            f"retired {original.lower()}",
-            f"former {original.lower()}",
-            original.lower()
-        ]
-        return any(var in stated.lower() or stated.lower() in var for var in variations)
+    def _is_reasonable_occupation_variation(self, persona: PersonaProfile, stated: str) -> bool:
+        """Check if a (lowercased) stated occupation is a reasonable variation of the persona's"""
+        return any(var in stated or stated in var for var in persona._occupation_variations)
+
+
+@dataclass(slots=True)
+class PersonaSession:
+    """Per-conversation persona state: the selected profile, its rendered context and the memory"""
+    persona: PersonaProfile
+    context: str  # Shared with every session using this profile
+    memory: ConversationMemory = field(default_factory=ConversationMemory)
 
 
 class PersonaManager:
@@ -278,31 +381,45 @@ class PersonaManager:
         ),
     }
     
+    # Map scam types to persona types
+    _SCAM_TO_PERSONA = {
+        ScamType.JOB_SCAM: PersonaType.JOB_SEEKER,
+        ScamType.INVESTMENT_SCAM: PersonaType.INVESTOR,
+        ScamType.BANKING_FRAUD: PersonaType.TECH_NOVICE,
+        ScamType.PRIZE_LOTTERY: PersonaType.ELDERLY,
+        ScamType.TECH_SUPPORT: PersonaType.TECH_NOVICE,
+        ScamType.ROMANCE_SCAM: PersonaType.ELDERLY,
+        ScamType.IMPERSONATION: PersonaType.TECH_NOVICE,
+    }
+    
+    # Resolved once so select_persona is a single lookup (no comprehension: class scope isn't visible in one)
+    _PERSONAS_BY_SCAM = dict(zip(_SCAM_TO_PERSONA, map(PERSONAS.__getitem__, _SCAM_TO_PERSONA.values())))
+    
     def __init__(self):
-        self.current_persona: Optional[PersonaProfile] = None
-        self.memory: Optional[ConversationMemory] = None
+        self.session: Optional[PersonaSession] = None
+    
+    @property
+    def current_persona(self) -> Optional[PersonaProfile]:
+        """Persona of the active session"""
+        return self.session.persona if self.session else None
+    
+    @property
+    def memory(self) -> Optional[ConversationMemory]:
+        """Memory of the active session"""
+        return self.session.memory if self.session else None
     
     def select_persona(self, scam_type: ScamType) -> PersonaProfile:
-        """Select appropriate persona based on scam type"""
-        
-        # Map scam types to persona types
-        persona_mapping = {
-            ScamType.JOB_SCAM: PersonaType.JOB_SEEKER,
-            ScamType.INVESTMENT_SCAM: PersonaType.INVESTOR,
-            ScamType.BANKING_FRAUD: PersonaType.TECH_NOVICE,
-            ScamType.PRIZE_LOTTERY: PersonaType.ELDERLY,
-            ScamType.TECH_SUPPORT: PersonaType.TECH_NOVICE,
-            ScamType.ROMANCE_SCAM: PersonaType.ELDERLY,
-            ScamType.IMPERSONATION: PersonaType.TECH_NOVICE,
-        }
-        
-        persona_type = persona_mapping.get(scam_type, PersonaType.TECH_NOVICE)
-        self.current_persona = self.PERSONAS[persona_type]
-        self.memory = ConversationMemory()
+        """Select appropriate persona based on scam type and start a new session with it"""
+        return self.start_session(scam_type).persona
+    
+    def start_session(self, scam_type: ScamType) -> PersonaSession:
+        """Create the persona session for a new conversation and make it the active one"""
+        persona = self._PERSONAS_BY_SCAM.get(scam_type, self.PERSONAS[PersonaType.TECH_NOVICE])
+        self.session = PersonaSession(persona=persona, context=persona.to_context_string())
         
-        logger.info(f"Selected persona: {self.current_persona.name} ({persona_type.value}) for scam type {scam_type.value}")
+        logger.info(f"Selected persona: {persona.name} ({persona.persona_type.value}) for scam type {scam_type.value}")
         
-        return self.current_persona
+        return self.session
     
     def add_message(self, role: str, content: str):
         """Add message to conversation memory"""
@@ -326,12 +443,12 @@ class PersonaManager:
     
     def get_persona_context(self) -> str:
         """Get persona context for LLM"""
-        if not self.current_persona:
+        if not self.session:
             raise ValueError("No persona selected")
         
-        return self.current_persona.to_context_string()
+        return self.session.context
     
-    def get_conversation_history(self, count: int = 5) -> List[Dict[str, str]]:
+    def get_conversation_history(self, count: int = RECENT_CONTEXT_SIZE) -> List[Dict[str, Any]]:
         """Get recent conversation history"""
         if not self.memory:
             return []
@@ -343,16 +460,10 @@ class PersonaManager:
         if not self.current_persona:
             return config.persona.typing_delay_seconds
         
-        # Calculate based on words per minute
-        words = message_length / 5  # Average 5 characters per word
-        minutes = words / self.current_persona.max_typing_speed_wpm
-        seconds = minutes * 60
-        
-        # Add some randomness (±20%)
-        import random
-        variation = random.uniform(0.8, 1.2)
+        # Calculate based on words per minute, with some randomness (±20%)
+        seconds = message_length * self.current_persona.seconds_per_char * (0.8 + 0.4 * _rand())
         
-        return max(seconds * variation, 1.0)  # Minimum 1 second
+        return seconds if seconds >= 1.0 else 1.0  # Minimum 1 second
 
 
 # Global persona manager instance
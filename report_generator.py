@@ -3,29 +3,80 @@ Intelligence Report Generator
 Generates structured reports with legal disclaimers
 """
 
-import json
-from datetime import datetime
+import secrets
+import functools
+import orjson
 from typing import Dict, Any, Optional
-from utils import logger, get_timestamp
+from utils import logger, get_timestamp, format_timestamp_ns
 from config import config
 from scam_detector import ScamDetectionResult
 from entity_extractor import extractor
-from persona_manager import persona_manager
+from persona_manager import persona_manager, PersonaSession
 from strategy_engine import strategy
 
 
+_LEGAL_DISCLAIMER_TEMPLATE = """
+LEGAL DISCLAIMER:
+
+This report was generated by an automated honeypot system for cybersecurity research and scam detection purposes.
+
+IMPORTANT NOTICES:
+1. Data Verification: All extracted entities should be independently verified before use. Some data may be fake, temporary, or test accounts used by scammers.
+
+2. Legal Use: This report is intended for:
+   - Cybersecurity research
+   - Law enforcement coordination (where applicable)
+   - Scam pattern analysis
+   - Educational purposes
+
+3. Privacy Considerations: This system engaged in cyber deception. Ensure compliance with local laws regarding:
+   - Honeypot operations
+   - Data collection and retention
+   - Evidence handling
+
+4. No Warranty: The information is provided "as is" without warranty. The system may produce false positives or miss scam indicators.
+
+5. Jurisdiction: This report was generated under the jurisdiction of {jurisdiction}. Consult legal counsel before using this data for law enforcement or legal proceedings.
+
+6. Data Retention: Per configuration, conversation data will be retained for {retention_days} days.
+
+For questions or to report issues, contact the system administrator.
+"""
+
+
+@functools.lru_cache(maxsize=4)
+def _render_disclaimer(jurisdiction: str, retention_days: int) -> str:
+    """Format the legal disclaimer (cached per jurisdiction and retention period)"""
+    return _LEGAL_DISCLAIMER_TEMPLATE.format(
+        jurisdiction=jurisdiction,
+        retention_days=retention_days
+    )
+
+
 class ReportGenerator:
     """Generates intelligence reports from honeypot conversations"""
     
     def generate_report(self, 
                        detection_result: ScamDetectionResult,
-                       stop_reason: Optional[str] = None) -> Dict[str, Any]:
-        """Generate comprehensive intelligence report"""
+                       stop_reason: Optional[str] = None,
+                       include_transcript: bool = True,
+                       session: Optional[PersonaSession] = None) -> Dict[str, Any]:
+        """
+        Generate comprehensive intelligence report
+        
+        Args:
+            detection_result: Detection result that activated the honeypot
+            stop_reason: Why the conversation ended
+            include_transcript: Copy every message into the report; summary-only
+                callers can pass False (conversation_transcript is then None)
+            session: Persona session to report on (defaults to the active one)
+        """
         
         logger.info("Generating intelligence report")
         
         # Get conversation data
-        conversation_history = persona_manager.get_conversation_history(count=100)  # All messages
+        session = session or persona_manager.session
+        conversation_history = session.memory.get_recent_messages(count=100) if session else []  # All messages
         state_summary = strategy.get_state_summary()
         entities_data = extractor.to_dict()
         
@@ -33,9 +84,9 @@ class ReportGenerator:
         report = {
             "report_metadata": self._get_metadata(),
             "scam_classification": self._get_classification(detection_result),
-            "conversation_summary": self._get_conversation_summary(conversation_history, state_summary),
+            "conversation_summary": self._get_conversation_summary(conversation_history, state_summary, session),
             "extracted_intelligence": entities_data,
-            "conversation_transcript": self._get_transcript(conversation_history),
+            "conversation_transcript": self._get_transcript(conversation_history) if include_transcript else None,
             "strategic_analysis": self._get_strategic_analysis(state_summary, stop_reason),
             "legal_disclaimer": self._get_legal_disclaimer() if config.legal.enable_legal_disclaimers else None
         }
@@ -52,10 +103,8 @@ class ReportGenerator:
         }
     
     def _generate_report_id(self) -> str:
-        """Generate unique report ID"""
-        import hashlib
-        timestamp = datetime.utcnow().isoformat()
-        return hashlib.md5(timestamp.encode()).hexdigest()[:12]
+        """Generate unique report ID (12 random hex characters)"""
+        return secrets.token_hex(6)
     
     def _get_classification(self, detection_result: ScamDetectionResult) -> Dict[str, Any]:
         """Get scam classification details"""
@@ -67,13 +116,14 @@ class ReportGenerator:
             "detection_layers": detection_result.layer_scores
         }
     
-    def _get_conversation_summary(self, history: list, state: Dict[str, Any]) -> Dict[str, Any]:
+    def _get_conversation_summary(self, history: list, state: Dict[str, Any],
+                                  session: Optional[PersonaSession]) -> Dict[str, Any]:
         """Get conversation summary"""
         return {
             "total_messages": len(history),
             "duration_minutes": state.get("elapsed_minutes", 0),
             "conversation_phases": self._extract_phases(history),
-            "persona_used": persona_manager.current_persona.name if persona_manager.current_persona else "Unknown"
+            "persona_used": session.persona.name if session else "Unknown"
         }
     
     def _extract_phases(self, history: list) -> list:
@@ -90,14 +140,15 @@ class ReportGenerator:
     
     def _get_transcript(self, history: list) -> list:
         """Get formatted conversation transcript"""
-        transcript = []
-        for msg in history:
-            transcript.append({
-                "timestamp": msg.get("timestamp", ""),
-                "role": msg.get("role", ""),
-                "message": msg.get("content", "")
-            })
-        return transcript
+        # Messages come from ConversationMemory.add_message, so every key is present
+        return [
+            {
+                "timestamp": format_timestamp_ns(msg["timestamp"]),
+                "role": msg["role"],
+                "message": msg["content"]
+            }
+            for msg in history
+        ]
     
     def _get_strategic_analysis(self, state: Dict[str, Any], stop_reason: Optional[str]) -> Dict[str, Any]:
         """Get strategic analysis"""
@@ -119,42 +170,13 @@ class ReportGenerator:
     
     def _get_legal_disclaimer(self) -> str:
         """Get legal disclaimer"""
-        return """
-LEGAL DISCLAIMER:
-
-This report was generated by an automated honeypot system for cybersecurity research and scam detection purposes.
-
-IMPORTANT NOTICES:
-1. Data Verification: All extracted entities should be independently verified before use. Some data may be fake, temporary, or test accounts used by scammers.
-
-2. Legal Use: This report is intended for:
-   - Cybersecurity research
-   - Law enforcement coordination (where applicable)
-   - Scam pattern analysis
-   - Educational purposes
-
-3. Privacy Considerations: This system engaged in cyber deception. Ensure compliance with local laws regarding:
-   - Honeypot operations
-   - Data collection and retention
-   - Evidence handling
-
-4. No Warranty: The information is provided "as is" without warranty. The system may produce false positives or miss scam indicators.
-
-5. Jurisdiction: This report was generated under the jurisdiction of {jurisdiction}. Consult legal counsel before using this data for law enforcement or legal proceedings.
-
-6. Data Retention: Per configuration, conversation data will be retained for {retention_days} days.
-
-For questions or to report issues, contact the system administrator.
-""".format(
-            jurisdiction=config.legal.jurisdiction,
-            retention_days=config.legal.data_retention_days
-        )
+        return _render_disclaimer(config.legal.jurisdiction, config.legal.data_retention_days)
     
     def export_json(self, report: Dict[str, Any], filepath: str):
         """Export report as JSON"""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
             logger.info(f"Report exported to {filepath}")
         except Exception as e:
             logger.error(f"Failed to export report: {e}")
@@ -171,7 +193,7 @@ For questions or to report issues, contact the system administrator.
     
     def _format_as_markdown(self, report: Dict[str, Any]) -> str:
         """Format report as Markdown"""
-        md = f"""# Honeypot Intelligence Report
+        parts = [f"""# Honeypot Intelligence Report
 
 **Report ID:** {report['report_metadata']['report_id']}  
 **Generated:** {report['report_metadata']['generated_at']}  
@@ -198,29 +220,31 @@ For questions or to report issues, contact the system administrator.
 **High-Value Entities:** {report['extracted_intelligence']['high_value_entities']}
 
 ### Entities by Type
-"""
+"""]
         
+        # Accumulate pieces and join once (repeated += copies the growing string)
         for entity_type, count in report['extracted_intelligence']['entities_by_type'].items():
-            md += f"- **{entity_type}:** {count}\n"
+            parts.append(f"- **{entity_type}:** {count}\n")
         
-        md += "\n### Detailed Entities\n\n"
+        parts.append("\n### Detailed Entities\n\n")
         for entity in report['extracted_intelligence']['all_entities']:
-            md += f"- **{entity['type']}:** `{entity['normalized_value']}` (confidence: {entity['confidence']})\n"
+            parts.append(f"- **{entity['type']}:** `{entity['normalized_value']}` (confidence: {entity['confidence']})\n")
         
-        md += f"\n## Strategic Analysis\n\n"
-        md += f"- **Final Phase:** {report['strategic_analysis']['final_phase']}\n"
-        md += f"- **Stop Reason:** {report['strategic_analysis']['stop_reason']}\n"
-        md += f"- **Entities Extracted:** {report['strategic_analysis']['entities_extracted']}\n"
+        parts.append(f"\n## Strategic Analysis\n\n")
+        parts.append(f"- **Final Phase:** {report['strategic_analysis']['final_phase']}\n")
+        parts.append(f"- **Stop Reason:** {report['strategic_analysis']['stop_reason']}\n")
+        parts.append(f"- **Entities Extracted:** {report['strategic_analysis']['entities_extracted']}\n")
         
-        md += "\n## Conversation Transcript\n\n"
-        for msg in report['conversation_transcript']:
-            role = "🚨 Scammer" if msg['role'] == 'scammer' else "👤 Victim"
-            md += f"**{role}:** {msg['message']}\n\n"
+        if report['conversation_transcript'] is not None:
+            parts.append("\n## Conversation Transcript\n\n")
+            for msg in report['conversation_transcript']:
+                role = "🚨 Scammer" if msg['role'] == 'scammer' else "👤 Victim"
+                parts.append(f"**{role}:** {msg['message']}\n\n")
         
         if report.get('legal_disclaimer'):
-            md += f"\n---\n\n{report['legal_disclaimer']}\n"
+            parts.append(f"\n---\n\n{report['legal_disclaimer']}\n")
         
-        return md
+        return "".join(parts)
 
 
 # Global report generator instance
@@ -5,11 +5,13 @@ Addresses Drawback #1: False Positives
 
 import re
 import json
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from itertools import chain
+from typing import Dict, Any, List, Optional, Set, Tuple
+from dataclasses import dataclass, replace
 from enum import Enum
 from config import config
-from utils import logger, calculate_weighted_score
+from utils import logger, KeywordMatcher
 from llm_interface import llm
 
 
@@ -26,7 +28,11 @@ class ScamType(Enum):
     NOT_SCAM = "not_scam"
 
 
-@dataclass
+# LLM scam_type strings -> ScamType, without Enum lookup and exception on misses
+_SCAM_TYPES_BY_VALUE = {scam_type.value: scam_type for scam_type in ScamType}
+
+
+@dataclass(slots=True)
 class ScamDetectionResult:
     """Result of scam detection analysis"""
     is_scam: bool
@@ -34,6 +40,8 @@ class ScamDetectionResult:
     scam_type: ScamType
     reasoning: str
     layer_scores: Dict[str, float]  # Scores from each detection layer
+    llm_parsed: bool = True  # False when the LLM layer's answer could not be parsed
+    llm_used_fallback: bool = False  # True when the LLM call failed and a fallback reply stood in
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -45,6 +53,15 @@ class ScamDetectionResult:
         }
 
 
+def _index_keyword_categories(categories: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+    """Map each keyword to the categories it belongs to"""
+    index: Dict[str, Tuple[str, ...]] = {}
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            index[keyword] = index.get(keyword, ()) + (category,)
+    return index
+
+
 class KeywordDetector:
     """Layer 1: Keyword-based detection"""
     
@@ -81,39 +98,73 @@ class KeywordDetector:
         "opportunity", "registration fee", "training fee", "joining fee"
     ]
     
-    # Legitimate sender patterns (whitelist)
+    # All categories are matched in a single pass over the message
+    _KEYWORD_CATEGORIES = _index_keyword_categories({
+        "urgency": URGENCY_KEYWORDS,
+        "money": MONEY_KEYWORDS,
+        "threat": THREAT_KEYWORDS,
+        "request": REQUEST_KEYWORDS,
+        "prize": PRIZE_KEYWORDS,
+        "job": JOB_KEYWORDS,
+    })
+    _KEYWORD_MATCHER = KeywordMatcher(_KEYWORD_CATEGORIES)
+    
+    # Legitimate sender domains (whitelist, matched case-insensitively as suffixes)
+    LEGITIMATE_DOMAINS = (
+        '@amazon.com',
+        '@google.com',
+        '@microsoft.com',
+        '@linkedin.com',
+    )
+    
+    # Legitimate sender patterns that are not plain domains (whitelist)
     LEGITIMATE_PATTERNS = [
-        r'@amazon\.com$',
-        r'@google\.com$',
-        r'@microsoft\.com$',
-        r'@linkedin\.com$',
         r'-[A-Z]{6}$',  # Standard bank message IDs
     ]
+    _LEGITIMATE_RE = re.compile('|'.join(LEGITIMATE_PATTERNS), re.IGNORECASE)
     
     @staticmethod
-    def detect(message: str, sender: Optional[str] = None) -> Dict[str, Any]:
-        """Detect scam indicators using keywords"""
-        message_lower = message.lower()
+    def _matched_keywords(message_lower: str) -> Set[str]:
+        """
+        Keywords not preceded by a letter: "bank" in "banking" and "lakh" in
+        "5lakh" count, "bank" in "embankment" does not
+        """
+        return {
+            keyword
+            for start, keyword in KeywordDetector._KEYWORD_MATCHER.find_positions(message_lower)
+            if start == 0 or not message_lower[start - 1].isalpha()
+        }
+    
+    @staticmethod
+    def detect(message: str, sender: Optional[str] = None,
+               message_lower: Optional[str] = None) -> Dict[str, Any]:
+        """Detect scam indicators using keywords (message_lower: precomputed message.lower())"""
+        if message_lower is None:
+            message_lower = message.lower()
         
         # Check whitelist first
         if sender and config.scam_detection.enable_whitelist:
-            for pattern in KeywordDetector.LEGITIMATE_PATTERNS:
-                if re.search(pattern, sender, re.IGNORECASE):
-                    logger.debug(f"Sender {sender} matches whitelist pattern")
-                    return {
-                        "score": 0.0,
-                        "scam_type": ScamType.NOT_SCAM,
-                        "indicators": ["whitelisted_sender"]
-                    }
-        
-        # Count keyword matches
+            if (sender.lower().endswith(KeywordDetector.LEGITIMATE_DOMAINS)
+                    or KeywordDetector._LEGITIMATE_RE.search(sender)):
+                logger.debug(f"Sender {sender} matches whitelist pattern")
+                return {
+                    "score": 0.0,
+                    "scam_type": ScamType.NOT_SCAM,
+                    "indicators": ["whitelisted_sender"]
+                }
+        
+        # Count distinct keywords present per category
         indicators = []
-        urgency_count = sum(1 for kw in KeywordDetector.URGENCY_KEYWORDS if kw in message_lower)
-        money_count = sum(1 for kw in KeywordDetector.MONEY_KEYWORDS if kw in message_lower)
-        threat_count = sum(1 for kw in KeywordDetector.THREAT_KEYWORDS if kw in message_lower)
-        request_count = sum(1 for kw in KeywordDetector.REQUEST_KEYWORDS if kw in message_lower)
-        prize_count = sum(1 for kw in KeywordDetector.PRIZE_KEYWORDS if kw in message_lower)
-        job_count = sum(1 for kw in KeywordDetector.JOB_KEYWORDS if kw in message_lower)
+        counts = Counter(chain.from_iterable(
+            KeywordDetector._KEYWORD_CATEGORIES[keyword]
+            for keyword in KeywordDetector._matched_keywords(message_lower)
+        ))
+        urgency_count = counts["urgency"]
+        money_count = counts["money"]
+        threat_count = counts["threat"]
+        request_count = counts["request"]
+        prize_count = counts["prize"]
+        job_count = counts["job"]
         
         # Determine scam type based on keyword patterns
         scam_type = ScamType.UNKNOWN
@@ -164,32 +215,47 @@ class PatternDetector:
     UPI_PATTERN = r'[a-zA-Z0-9._-]+@[a-zA-Z0-9.-]+'
     URL_PATTERN = r'https?://[^\s]+|www\.[^\s]+|bit\.ly/[^\s]+|tinyurl\.com/[^\s]+'
     
+    # Compiled once; detect() runs on every inbound message
+    _PHONE_RE = re.compile(PHONE_PATTERN)
+    _BANK_ACCOUNT_RE = re.compile(BANK_ACCOUNT_PATTERN)
+    _UPI_RE = re.compile(UPI_PATTERN)
+    _URL_RE = re.compile(URL_PATTERN)
+    _OBFUSCATED_NUMBER_RE = re.compile(r'\d\s+\d\s+\d')
+    _DIGIT_RE = re.compile(r'\d')
+    
     # Suspicious URL patterns
     SUSPICIOUS_DOMAINS = [
         'bit.ly', 'tinyurl.com', 'goo.gl', 't.co',  # URL shorteners
         '.tk', '.ml', '.ga', '.cf',  # Free domains
     ]
+    _SUSPICIOUS_DOMAIN_MATCHER = KeywordMatcher(SUSPICIOUS_DOMAINS)
+    
+    PAYMENT_METHODS = ('upi', 'paytm', 'gpay', 'phonepe', 'bank account', 'account number')
     
     @staticmethod
-    def detect(message: str) -> Dict[str, Any]:
-        """Detect suspicious patterns"""
+    def detect(message: str, message_lower: Optional[str] = None) -> Dict[str, Any]:
+        """Detect suspicious patterns (message_lower: precomputed message.lower())"""
         indicators = []
         score = 0.0
         
+        # Phone, bank and obfuscation patterns need a digit and UPI IDs an '@';
+        # checking once lets most messages skip those scans entirely
+        has_digit = PatternDetector._DIGIT_RE.search(message) is not None
+        
         # Check for phone numbers
-        phone_matches = re.findall(PatternDetector.PHONE_PATTERN, message)
+        phone_matches = PatternDetector._PHONE_RE.findall(message) if has_digit else []
         if phone_matches:
             indicators.append(f"phone_numbers:{len(phone_matches)}")
             score += 0.2
         
         # Check for bank accounts
-        bank_matches = re.findall(PatternDetector.BANK_ACCOUNT_PATTERN, message)
+        bank_matches = PatternDetector._BANK_ACCOUNT_RE.findall(message) if has_digit else []
         if bank_matches:
             indicators.append(f"bank_accounts:{len(bank_matches)}")
             score += 0.3
         
         # Check for UPI IDs
-        upi_matches = re.findall(PatternDetector.UPI_PATTERN, message)
+        upi_matches = PatternDetector._UPI_RE.findall(message) if '@' in message else []
         # Filter out email addresses (common false positive)
         upi_matches = [u for u in upi_matches if not u.endswith(('.com', '.org', '.net', '.in'))]
         if upi_matches:
@@ -197,27 +263,27 @@ class PatternDetector:
             score += 0.3
         
         # Check for URLs
-        url_matches = re.findall(PatternDetector.URL_PATTERN, message)
+        url_matches = PatternDetector._URL_RE.findall(message)
         if url_matches:
             indicators.append(f"urls:{len(url_matches)}")
             score += 0.1
             
-            # Check for suspicious domains
-            for url in url_matches:
-                if any(domain in url.lower() for domain in PatternDetector.SUSPICIOUS_DOMAINS):
-                    indicators.append("suspicious_url")
-                    score += 0.3
-                    break
+            # Check for suspicious domains (one automaton pass per URL)
+            matcher = PatternDetector._SUSPICIOUS_DOMAIN_MATCHER
+            if any(matcher.find_all(url.lower()) for url in url_matches):
+                indicators.append("suspicious_url")
+                score += 0.3
         
         # Multiple payment methods mentioned is suspicious
-        payment_methods = ['upi', 'paytm', 'gpay', 'phonepe', 'bank account', 'account number']
-        payment_count = sum(1 for pm in payment_methods if pm in message.lower())
+        if message_lower is None:
+            message_lower = message.lower()
+        payment_count = sum(1 for pm in PatternDetector.PAYMENT_METHODS if pm in message_lower)
         if payment_count >= 2:
             indicators.append("multiple_payment_methods")
             score += 0.2
         
         # Check for obfuscated text (spaces in numbers)
-        if re.search(r'\d\s+\d\s+\d', message):
+        if has_digit and PatternDetector._OBFUSCATED_NUMBER_RE.search(message):
             indicators.append("obfuscated_numbers")
             score += 0.2
         
@@ -233,38 +299,159 @@ class ScamDetector:
     def __init__(self):
         self.keyword_detector = KeywordDetector()
         self.pattern_detector = PatternDetector()
+        
+        # Layer weights are fixed by the (frozen) config, so sum them once
+        self._weights = (
+            config.scam_detection.keyword_weight,
+            config.scam_detection.pattern_weight,
+            config.scam_detection.llm_weight
+        )
+        self._total_weight = sum(self._weights)
+        
+        # Scam templates get resent verbatim; (message, sender) -> result, LRU ordered
+        self._result_cache: "OrderedDict[Tuple[str, Optional[str]], ScamDetectionResult]" = OrderedDict()
     
-    def detect(self, message: str, sender: Optional[str] = None) -> ScamDetectionResult:
+    def detect(self, message: str, sender: Optional[str] = None,
+               llm_result: Optional[Dict[str, Any]] = None) -> ScamDetectionResult:
         """
         Perform multi-layer scam detection
         
         Args:
             message: The message to analyze
             sender: Optional sender identifier for whitelist checking
+            llm_result: Precomputed LLM analysis (e.g. from a batch call); skips the LLM layer call
         
         Returns:
-            ScamDetectionResult with confidence score and reasoning
+            ScamDetectionResult with confidence score and reasoning (memoized per
+            message and sender when the LLM layer is run here)
         """
-        logger.info(f"Analyzing message for scam indicators (sender: {sender})")
+        if llm_result is not None:
+            return self._combine_layers(*self._rule_layers(message, sender), llm_result)
         
-        # Layer 1: Keyword detection
-        keyword_result = self.keyword_detector.detect(message, sender)
-        keyword_score = keyword_result["score"]
+        cached = self._cache_get(message, sender)
+        if cached is not None:
+            return cached
         
-        # Layer 2: Pattern detection
-        pattern_result = self.pattern_detector.detect(message)
-        pattern_score = pattern_result["score"]
+        keyword_result, pattern_result = self._rule_layers(message, sender)
         
         # Layer 3: LLM semantic analysis
-        llm_result = llm.detect_scam(message)
-        llm_score = llm_result.get("confidence", 0.0) if llm_result.get("is_scam", False) else 0.0
+        llm_result = llm.detect_scam(message) if self._llm_layer_needed(keyword_result, pattern_result) else {}
         
-        # Calculate weighted confidence score
-        weights = {
-            "keyword": config.scam_detection.keyword_weight,
-            "pattern": config.scam_detection.pattern_weight,
-            "llm": config.scam_detection.llm_weight
-        }
+        result = self._combine_layers(keyword_result, pattern_result, llm_result)
+        self._cache_put(message, sender, result)
+        return result
+    
+    async def adetect(self, message: str, sender: Optional[str] = None,
+                      llm_result: Optional[Dict[str, Any]] = None) -> ScamDetectionResult:
+        """Async variant of detect(): awaits the LLM layer instead of blocking the event loop"""
+        if llm_result is not None:
+            return self._combine_layers(*self._rule_layers(message, sender), llm_result)
+        
+        cached = self._cache_get(message, sender)
+        if cached is not None:
+            return cached
+        
+        keyword_result, pattern_result = self._rule_layers(message, sender)
+        llm_result = await llm.adetect_scam(message) if self._llm_layer_needed(keyword_result, pattern_result) else {}
+        
+        result = self._combine_layers(keyword_result, pattern_result, llm_result)
+        self._cache_put(message, sender, result)
+        return result
+    
+    def detect_batch(self, messages: List[str],
+                     senders: Optional[List[Optional[str]]] = None) -> List[ScamDetectionResult]:
+        """Detect several messages, sharing batched LLM calls for the semantic layer"""
+        layers, pending = self._batch_rule_layers(messages, senders)
+        llm_results = iter(llm.detect_scam_batch([messages[i] for i in pending]))
+        return self._combine_batch(layers, pending, llm_results)
+    
+    async def adetect_batch(self, messages: List[str],
+                            senders: Optional[List[Optional[str]]] = None) -> List[ScamDetectionResult]:
+        """Async detect_batch()"""
+        layers, pending = self._batch_rule_layers(messages, senders)
+        llm_results = iter(await llm.adetect_scam_batch([messages[i] for i in pending]))
+        return self._combine_batch(layers, pending, llm_results)
+    
+    def _cache_get(self, message: str, sender: Optional[str]) -> Optional[ScamDetectionResult]:
+        """Return a copy of a memoized result, if any"""
+        result = self._result_cache.get((message, sender))
+        if result is None:
+            return None
+        
+        self._result_cache.move_to_end((message, sender))
+        logger.debug(f"Detection cache hit (sender: {sender})")
+        return replace(result, layer_scores=dict(result.layer_scores))
+    
+    def _cache_put(self, message: str, sender: Optional[str], result: ScamDetectionResult):
+        """Memoize a result, unless its LLM layer failed or was unparseable (a retry may succeed)"""
+        if config.scam_detection.result_cache_size <= 0 or not result.llm_parsed or result.llm_used_fallback:
+            return
+        
+        self._result_cache[(message, sender)] = replace(result, layer_scores=dict(result.layer_scores))
+        self._result_cache.move_to_end((message, sender))
+        if len(self._result_cache) > config.scam_detection.result_cache_size:
+            self._result_cache.popitem(last=False)
+    
+    def _rule_layers(self, message: str, sender: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Run the keyword (layer 1) and pattern (layer 2) detectors"""
+        logger.info(f"Analyzing message for scam indicators (sender: {sender})")
+        message_lower = message.lower()
+        return (self.keyword_detector.detect(message, sender, message_lower),
+                self.pattern_detector.detect(message, message_lower))
+    
+    def _batch_rule_layers(self, messages: List[str], senders: Optional[List[Optional[str]]]):
+        """Rule layers for every message, plus the indices that still need the LLM layer"""
+        senders = senders or [None] * len(messages)
+        layers = [self._rule_layers(message, sender) for message, sender in zip(messages, senders)]
+        pending = [i for i, (keyword_result, pattern_result) in enumerate(layers)
+                   if self._llm_layer_needed(keyword_result, pattern_result)]
+        return layers, pending
+    
+    def _combine_batch(self, layers, pending: List[int], llm_results) -> List[ScamDetectionResult]:
+        """Combine batch rule layers with the LLM results for the pending indices"""
+        pending = set(pending)
+        return [
+            self._combine_layers(keyword_result, pattern_result, next(llm_results) if i in pending else {})
+            for i, (keyword_result, pattern_result) in enumerate(layers)
+        ]
+    
+    def _weighted_confidence(self, keyword_score: float, pattern_score: float, llm_score: float) -> float:
+        """utils.calculate_weighted_score() specialised to the three layer weights (same result)"""
+        if self._total_weight <= 0:
+            return 0.0
+        keyword_weight, pattern_weight, llm_weight = self._weights
+        return (keyword_score * keyword_weight + pattern_score * pattern_weight
+                + llm_score * llm_weight) / self._total_weight
+    
+    def _llm_layer_needed(self, keyword_result: Dict[str, Any], pattern_result: Dict[str, Any]) -> bool:
+        """
+        Whether the LLM score could still change the verdict
+        
+        The final confidence rises monotonically with the LLM score, so if even
+        an LLM score of 1.0 stays under the threshold the message is not a scam.
+        If an LLM score of 0.0 already clears it, the message is a scam, but the
+        call is only skipped when the keywords have fixed the scam type too
+        (otherwise the type would come from the LLM).
+        """
+        if not config.scam_detection.skip_decided_llm:
+            return True
+        
+        keyword_score, pattern_score = keyword_result["score"], pattern_result["score"]
+        threshold = config.scam_detection.confidence_threshold
+        
+        if self._weighted_confidence(keyword_score, pattern_score, 1.0) < threshold:
+            return False
+        if (keyword_result["scam_type"] != ScamType.UNKNOWN
+                and self._weighted_confidence(keyword_score, pattern_score, 0.0) >= threshold):
+            return False
+        return True
+    
+    def _combine_layers(self, keyword_result: Dict[str, Any], pattern_result: Dict[str, Any],
+                        llm_result: Dict[str, Any]) -> ScamDetectionResult:
+        """Weight the layer scores into a final detection result"""
+        keyword_score = keyword_result["score"]
+        pattern_score = pattern_result["score"]
+        llm_score = llm_result.get("confidence", 0.0) if llm_result.get("is_scam", False) else 0.0
         
         scores = {
             "keyword": keyword_score,
@@ -272,7 +459,8 @@ class ScamDetector:
             "llm": llm_score
         }
         
-        final_confidence = calculate_weighted_score(scores, weights)
+        # Calculate weighted confidence score
+        final_confidence = self._weighted_confidence(keyword_score, pattern_score, llm_score)
         
         # Determine if it's a scam based on threshold
         is_scam = final_confidence >= config.scam_detection.confidence_threshold
@@ -281,10 +469,7 @@ class ScamDetector:
         if keyword_result["scam_type"] != ScamType.UNKNOWN:
             scam_type = keyword_result["scam_type"]
         elif llm_result.get("scam_type"):
-            try:
-                scam_type = ScamType(llm_result["scam_type"])
-            except:
-                scam_type = ScamType.UNKNOWN
+            scam_type = _SCAM_TYPES_BY_VALUE.get(str(llm_result["scam_type"]), ScamType.UNKNOWN)
         else:
             scam_type = ScamType.UNKNOWN if is_scam else ScamType.NOT_SCAM
         
@@ -304,7 +489,9 @@ class ScamDetector:
             confidence=final_confidence,
             scam_type=scam_type,
             reasoning=reasoning,
-            layer_scores=scores
+            layer_scores=scores,
+            llm_parsed=llm_result.get("parsed", True),
+            llm_used_fallback=llm_result.get("used_fallback", False)
         )
         
         logger.info(f"Detection result: is_scam={is_scam}, confidence={final_confidence:.2f}, type={scam_type.value}")
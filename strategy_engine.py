@@ -3,12 +3,13 @@ Adaptive Strategy Engine with Stop Conditions
 Addresses Drawbacks #3, #9: Conversation Collapse & Over-Engagement
 """
 
+import re
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from config import config
-from utils import logger
+from utils import logger, KeywordMatcher
 from entity_extractor import extractor
 
 
@@ -33,7 +34,7 @@ class StopReason(Enum):
     AGENT_DISENGAGED = "agent_disengaged"
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversationState:
     """Tracks conversation state"""
     message_count: int = 0
@@ -50,6 +51,26 @@ class ConversationState:
             self.start_time = time.time()
 
 
+_REGEX_SYNTAX = frozenset('\\.^$*+?{}[]|()')
+
+
+def _indicator_checks(patterns: List[str]) -> Tuple[KeywordMatcher, List[Tuple[str, Optional[str], Optional[re.Pattern]]]]:
+    """
+    Split indicator patterns into plain phrases and real regexes
+    
+    Returns a KeywordMatcher over the lowercased phrases and, in pattern order,
+    (pattern, phrase, None) for phrases or (pattern, None, compiled) for regexes.
+    """
+    checks = []
+    for pattern in patterns:
+        phrase = pattern.replace("\\'", "'")
+        if _REGEX_SYNTAX.isdisjoint(phrase):
+            checks.append((pattern, phrase.lower(), None))
+        else:
+            checks.append((pattern, None, re.compile(pattern, re.IGNORECASE)))
+    return KeywordMatcher(phrase for _, phrase, _ in checks if phrase), checks
+
+
 class StrategyEngine:
     """Manages conversation strategy and stop conditions"""
     
@@ -73,6 +94,19 @@ class StrategyEngine:
         r'i will (?:report|complain)',
     ]
     
+    # Built once; analyze_scammer_message runs every scammer turn. Plain phrases
+    # share one automaton pass, only the remaining patterns need a regex search
+    _SUSPICION_MATCHER, _SUSPICION_CHECKS = _indicator_checks(SUSPICION_INDICATORS)
+    _UNPRODUCTIVE_MATCHER, _UNPRODUCTIVE_CHECKS = _indicator_checks(UNPRODUCTIVE_INDICATORS)
+    
+    # Matches iff some indicator does; most scammer turns contain none, so one
+    # search usually replaces both sweeps
+    _ANY_INDICATOR_RE = re.compile(
+        '|'.join(f'(?:{pattern})' for pattern in SUSPICION_INDICATORS + UNPRODUCTIVE_INDICATORS),
+        re.IGNORECASE
+    )
+    _MEDIA_REQUEST_RE = re.compile(r'(?:voice|audio|video|call|photo|picture)', re.IGNORECASE)
+    
     # Phase-specific strategies
     PHASE_STRATEGIES = {
         StrategyPhase.BUILD_TRUST: {
@@ -159,8 +193,6 @@ class StrategyEngine:
     
     def analyze_scammer_message(self, message: str) -> Dict[str, Any]:
         """Analyze scammer's message for indicators"""
-        import re
-        
         analysis = {
             "suspicion_detected": False,
             "unproductive_detected": False,
@@ -168,16 +200,19 @@ class StrategyEngine:
             "indicators": []
         }
         
-        # Check for suspicion indicators
-        for pattern in self.SUSPICION_INDICATORS:
-            if re.search(pattern, message, re.IGNORECASE):
+        if self._ANY_INDICATOR_RE.search(message):
+            message_lower = message.lower()
+            
+            # Check for suspicion indicators
+            for pattern in self._matched_indicators(message, message_lower, self._SUSPICION_MATCHER,
+                                                    self._SUSPICION_CHECKS):
                 analysis["suspicion_detected"] = True
                 analysis["indicators"].append(f"suspicion:{pattern}")
                 self.state.suspicion_indicators.append(pattern)
-        
-        # Check for unproductive indicators
-        for pattern in self.UNPRODUCTIVE_INDICATORS:
-            if re.search(pattern, message, re.IGNORECASE):
+            
+            # Check for unproductive indicators
+            for pattern in self._matched_indicators(message, message_lower, self._UNPRODUCTIVE_MATCHER,
+                                                    self._UNPRODUCTIVE_CHECKS):
                 analysis["unproductive_detected"] = True
                 analysis["indicators"].append(f"unproductive:{pattern}")
         
@@ -191,6 +226,16 @@ class StrategyEngine:
         
         return analysis
     
+    @staticmethod
+    def _matched_indicators(message: str, message_lower: str, matcher: KeywordMatcher,
+                            checks: List[Tuple[str, Optional[str], Optional[re.Pattern]]]) -> List[str]:
+        """Indicator patterns found in the message, in declaration order"""
+        phrases = matcher.find_all(message_lower)
+        return [
+            pattern for pattern, phrase, regex in checks
+            if (phrase in phrases if regex is None else regex.search(message))
+        ]
+    
     def determine_phase(self) -> StrategyPhase:
         """Determine current conversation phase"""
         
@@ -256,8 +301,7 @@ IMPORTANT: The scammer is testing if you're real.
 """
         
         # Handle requests for voice/image
-        import re
-        if re.search(r'(?:voice|audio|video|call|photo|picture)', scammer_message, re.IGNORECASE):
+        if self._MEDIA_REQUEST_RE.search(scammer_message):
             return """
 IMPORTANT: Scammer wants voice/video.
 Respond with a text-based excuse:
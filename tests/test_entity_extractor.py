@@ -0,0 +1,105 @@
+"""
+Tests for EntityExtractor's fused regex and length-tiered scans
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+# Configuration is read at import time (same settings as the other test modules,
+# whichever is imported first)
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "honeypot_test.log"))
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_TIMEOUT_SECONDS"] = "1"
+os.environ["LLM_LOCAL_CLASSIFIER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0.85"
+os.environ["ENABLE_URL_EXPANSION"] = "false"
+
+from entity_extractor import EntityExtractor, EntityType
+
+
+def _extract(message: str):
+    """(type, normalized value) of each entity found in a message"""
+    return [(entity.entity_type, entity.normalized_value) for entity in EntityExtractor().extract(message)]
+
+
+class FusedPatternOrderTest(unittest.TestCase):
+    """Each span goes to the first (most specific) alternative that matches it"""
+
+    def test_account_label_keeps_only_the_digits(self):
+        self.assertEqual(_extract("account number: 1234 5678 9012 please"),
+                         [(EntityType.BANK_ACCOUNT, "123456789012")])
+
+    def test_ten_to_fifteen_digits_are_a_phone_number(self):
+        self.assertEqual(_extract("call 9876543210 now"), [(EntityType.PHONE_NUMBER, "9876543210")])
+        self.assertEqual(_extract("id 123456789012345"), [(EntityType.PHONE_NUMBER, "123456789012345")])
+
+    def test_other_digit_runs_are_bank_accounts(self):
+        self.assertEqual(_extract("send to 123456789"), [(EntityType.BANK_ACCOUNT, "123456789")])
+        self.assertEqual(_extract("send to 1234567890123456"),
+                         [(EntityType.BANK_ACCOUNT, "1234567890123456")])
+
+    def test_email_wins_over_upi(self):
+        self.assertEqual(_extract("mail fraud@example.com"), [(EntityType.EMAIL, "fraud@example.com")])
+        self.assertEqual(_extract("pay fraud@paytm"), [(EntityType.UPI_ID, "fraud@paytm")])
+
+    def test_each_span_is_reported_once(self):
+        entities = _extract("visit https://x.com/a or call 9876543210 or pay fraud@paytm")
+
+        self.assertEqual([entity_type for entity_type, _ in entities],
+                         [EntityType.URL, EntityType.PHONE_NUMBER, EntityType.UPI_ID])
+
+
+class ObfuscatedUpiTest(unittest.TestCase):
+    """The "name at handle" UPI form doesn't swallow what follows "at" in prose"""
+
+    def test_name_at_handle_is_a_upi_id(self):
+        self.assertEqual(_extract("pay rahul at paytm today"), [(EntityType.UPI_ID, "rahul@paytm")])
+
+    def test_at_before_an_email_keeps_the_email(self):
+        self.assertEqual(_extract("mail me at john@x.com"), [(EntityType.EMAIL, "john@x.com")])
+
+    def test_at_before_a_number_keeps_the_number(self):
+        self.assertEqual(_extract("pay at 9876543210"), [(EntityType.PHONE_NUMBER, "9876543210")])
+
+
+class PatternForLengthTest(unittest.TestCase):
+    """Short messages are scanned only for the entity types that fit in them"""
+
+    # The shortest text of each type; each is exactly MIN_LEN characters long
+    SHORTEST = {
+        EntityType.URL: "www.x",
+        EntityType.EMAIL: "a@b.cc",
+        EntityType.UPI_ID: "a@b",
+        EntityType.CRYPTO_ADDRESS: "1" + "A" * 25,
+        EntityType.BANK_ACCOUNT: "123456789",
+        EntityType.PHONE_NUMBER: "9876543210",
+    }
+
+    @staticmethod
+    def scanned_types(length: int):
+        pattern = EntityExtractor()._pattern_for_length(length)
+        return {EntityExtractor.GROUP_TO_TYPE[group] for group in pattern.groupindex
+                if group in EntityExtractor.GROUP_TO_TYPE}
+
+    def test_too_short_for_any_entity(self):
+        self.assertIsNone(EntityExtractor()._pattern_for_length(2))
+        self.assertEqual(_extract("ok"), [])
+
+    def test_tiers_cover_the_types_that_fit(self):
+        for length in range(min(EntityExtractor.MIN_LEN.values()), 30):
+            with self.subTest(length=length):
+                expected = {t for t, min_len in EntityExtractor.MIN_LEN.items() if min_len <= length}
+                self.assertEqual(self.scanned_types(length), expected)
+
+    def test_shortest_entities_are_still_found(self):
+        for entity_type, text in self.SHORTEST.items():
+            with self.subTest(entity_type=entity_type):
+                self.assertEqual(len(text), EntityExtractor.MIN_LEN[entity_type])
+                self.assertEqual([t for t, _ in _extract(text)], [entity_type])
+
+
+if __name__ == "__main__":
+    unittest.main()
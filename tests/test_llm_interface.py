@@ -0,0 +1,113 @@
+"""
+Tests for LLMInterface's deadlines and concurrency limits
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import threading
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+# Configuration is read at import time (same settings as the other test modules,
+# whichever is imported first)
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "honeypot_test.log"))
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_TIMEOUT_SECONDS"] = "1"
+os.environ["LLM_LOCAL_CLASSIFIER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0.85"
+os.environ["ENABLE_URL_EXPANSION"] = "false"
+
+from config import config
+from llm_interface import llm, LLMResponse
+
+
+def _ok_call(system_prompt, user_prompt, max_tokens):
+    return LLMResponse(content="ok", success=True)
+
+
+async def _aok_call(system_prompt, user_prompt, max_tokens):
+    return _ok_call(system_prompt, user_prompt, max_tokens)
+
+
+class SyncDeadlineTest(unittest.TestCase):
+    """A sync call's deadline runs from when a worker starts it, not from submission"""
+
+    def test_queued_call_is_not_timed_out_by_busy_workers(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        # Occupy every worker past the deadline, like calls stuck after timing out
+        blockers = [llm._pool.submit(release.wait, config.llm.timeout_seconds + 0.5)
+                    for _ in range(config.llm.max_concurrency)]
+
+        response = llm._call_with_timeout(_ok_call, "system", "user", 10)
+
+        self.assertTrue(response.success)
+        for blocker in blockers:
+            blocker.result()
+
+    def test_slow_call_still_times_out(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def stuck_call(system_prompt, user_prompt, max_tokens):
+            release.wait()
+            return _ok_call(system_prompt, user_prompt, max_tokens)
+
+        start = time.perf_counter()
+        response = llm._call_with_timeout(stuck_call, "system", "user", 10)
+
+        self.assertFalse(response.success)
+        self.assertLess(time.perf_counter() - start, config.llm.timeout_seconds + 1)
+
+
+class AsyncConcurrencySlotTest(unittest.TestCase):
+    """agenerate() holds a concurrency slot only while an attempt runs"""
+
+    def free_slots(self) -> int:
+        return llm._get_semaphore()._value
+
+    def test_slot_is_free_during_rate_limiter_wait(self):
+        free_while_waiting = []
+
+        class RecordingLimiter:
+            async def __aenter__(limiter):
+                free_while_waiting.append(self.free_slots())
+
+            async def __aexit__(limiter, *exc_info):
+                return False
+
+        with mock.patch.object(llm, "_rate_limiter", RecordingLimiter()), \
+                mock.patch.object(llm, "_acall_ollama", _aok_call):
+            response = asyncio.run(llm.agenerate("system", "limiter wait"))
+
+        self.assertTrue(response.success)
+        self.assertEqual(free_while_waiting, [config.llm.max_concurrency])
+
+    def test_slot_is_released_before_backoff(self):
+        responses = iter([LLMResponse(content="", success=False, error="429 Too Many Requests"),
+                          LLMResponse(content="ok", success=True)])
+        free_during_backoff = []
+
+        async def rate_limited_call(system_prompt, user_prompt, max_tokens):
+            return next(responses)
+
+        def recording_backoff(attempt):
+            free_during_backoff.append(self.free_slots())
+            return 0
+
+        with mock.patch.object(config, "llm", replace(config.llm, max_retries=1)), \
+                mock.patch.object(llm, "_backoff_delay", recording_backoff), \
+                mock.patch.object(llm, "_acall_ollama", rate_limited_call):
+            response = asyncio.run(llm.agenerate("system", "rate limited"))
+
+        self.assertTrue(response.success)
+        self.assertEqual(free_during_backoff, [config.llm.max_concurrency])
+
+
+if __name__ == "__main__":
+    unittest.main()
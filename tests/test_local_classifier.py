@@ -0,0 +1,65 @@
+"""
+Tests for the local classifier's detection log
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+# Configuration is read at import time (same settings as test_scam_detector,
+# whichever of the two is imported first)
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "honeypot_test.log"))
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_TIMEOUT_SECONDS"] = "1"
+os.environ["LLM_LOCAL_CLASSIFIER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0.85"
+os.environ["ENABLE_URL_EXPANSION"] = "false"
+
+import orjson
+from local_classifier import LocalScamClassifier, NOT_SCAM_LABEL
+
+
+class DetectionLogTest(unittest.TestCase):
+    """Bad log lines are skipped and LLM scam types are validated before logging"""
+
+    def setUp(self):
+        handle, self.log_path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, self.log_path)
+        self.classifier = LocalScamClassifier()
+        self.classifier.enabled = True
+        self.classifier.log_path = self.log_path
+
+    def test_malformed_lines_are_skipped(self):
+        with open(self.log_path, "wb") as f:
+            f.write(b'{"message": "win a prize", "label": "prize_lottery"}\n')
+            f.write(b'{"message": "no label"}\n')
+            f.write(b'{"label": "job_scam"}\n')
+            f.write(b'{"message": ["x"], "label": "job_scam"}\n')
+            f.write(b'["not", "an", "object"]\n')
+            f.write(b'{"message": "trunc')
+
+        self.assertEqual(self.classifier._load_log(), (["win a prize"], ["prize_lottery"]))
+
+    def test_record_validates_scam_type(self):
+        cases = [
+            ({"is_scam": True, "scam_type": "job_scam"}, "job_scam"),
+            ({"is_scam": True, "scam_type": ["job_scam"]}, "unknown"),
+            ({"is_scam": True, "scam_type": {"a": 1}}, "unknown"),
+            ({"is_scam": True, "scam_type": "made_up"}, "unknown"),
+            ({"is_scam": True, "scam_type": NOT_SCAM_LABEL}, "unknown"),
+            ({"is_scam": True}, "unknown"),
+            ({"is_scam": False, "scam_type": "job_scam"}, NOT_SCAM_LABEL),
+        ]
+        for result, _ in cases:
+            self.classifier.record("message", result)
+
+        with open(self.log_path, "rb") as f:
+            labels = [orjson.loads(line)["label"] for line in f]
+        self.assertEqual(labels, [label for _, label in cases])
+
+
+if __name__ == "__main__":
+    unittest.main()
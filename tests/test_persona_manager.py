@@ -0,0 +1,103 @@
+"""
+Tests for ConversationMemory's persona statement and consistency scans
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import time
+import tempfile
+import unittest
+
+# Configuration is read at import time (same settings as the other test modules,
+# whichever is imported first)
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "honeypot_test.log"))
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_TIMEOUT_SECONDS"] = "1"
+os.environ["LLM_LOCAL_CLASSIFIER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0.85"
+os.environ["ENABLE_URL_EXPANSION"] = "false"
+
+from persona_manager import ConversationMemory, PersonaManager, PersonaType
+
+# Many "My ..." / "I am ..." openings with no closing "is": the old unbounded
+# ([a-zA-Z\s]+) captures rescanned the rest of the text from each of them
+_BACKTRACK_UNIT = "My word word word word word and i am a person here "
+
+
+def _long_message(size: int) -> str:
+    return (_BACKTRACK_UNIT * (size // len(_BACKTRACK_UNIT) + 1))[:size]
+
+
+def _best_time(func, *args) -> float:
+    """Fastest of three runs, to damp scheduler noise"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class LinearScanTest(unittest.TestCase):
+    """Scans grow linearly with message length (10x the text, well under 100x the time)"""
+
+    # Linear scaling gives ~10x between 10KB and 100KB; the old patterns gave ~100x
+    MAX_RATIO = 30
+
+    def assert_linear(self, func):
+        small = _best_time(func, _long_message(10_000))
+        large = _best_time(func, _long_message(100_000))
+        self.assertLess(large, 1.0)
+        self.assertLess(large / small, self.MAX_RATIO)
+
+    def test_statement_extraction_scales_linearly(self):
+        self.assert_linear(lambda text: ConversationMemory().add_message("victim", text))
+
+    def test_consistency_check_scales_linearly(self):
+        persona = PersonaManager.PERSONAS[PersonaType.TECH_NOVICE]
+        self.assert_linear(lambda text: ConversationMemory().check_consistency(text, persona))
+
+
+class StatementCaptureTest(unittest.TestCase):
+    """Captures stop after four words"""
+
+    def test_statement_is_cut_at_four_words(self):
+        memory = ConversationMemory()
+        memory.add_message("victim", "I am a retired bank employee from Pune and my son is here")
+
+        self.assertEqual(memory.persona_statements,
+                         ["Stated: retired bank employee from", "Stated: son here"])
+
+    def test_consistency_reads_four_word_location(self):
+        persona = PersonaManager.PERSONAS[PersonaType.TECH_NOVICE]
+        consistent, reason = ConversationMemory().check_consistency(
+            "I live in a small town near the river", persona
+        )
+
+        self.assertFalse(consistent)
+        self.assertTrue(reason.endswith("stated a small town near"))
+
+
+class RecentMessagesTest(unittest.TestCase):
+    """Recent message lists are snapshots"""
+
+    def test_later_messages_do_not_change_a_returned_history(self):
+        for count in (5, 3):
+            with self.subTest(count=count):
+                memory = ConversationMemory()
+                for i in range(7):
+                    memory.add_message("scammer", f"message {i}")
+
+                recent = memory.get_recent_messages(count)
+                self.assertIsInstance(recent, list)
+                self.assertEqual([m["content"] for m in recent][-1], "message 6")
+                self.assertEqual(len(recent), count)
+
+                snapshot = list(recent)
+                memory.add_message("victim", "later reply")
+                self.assertEqual(recent, snapshot)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for ScamDetector's result cache
+Run from the repository root: python -m unittest discover tests
+"""
+
+import os
+import asyncio
+import tempfile
+import unittest
+
+# Configuration is read at import time
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "honeypot_test.log"))
+os.environ["LLM_PROVIDER"] = "ollama"
+os.environ["LLM_MAX_RETRIES"] = "0"
+os.environ["LLM_TIMEOUT_SECONDS"] = "1"
+os.environ["LLM_LOCAL_CLASSIFIER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0.85"
+os.environ["ENABLE_URL_EXPANSION"] = "false"
+
+from config import config
+from llm_interface import llm, LLMResponse
+from scam_detector import ScamDetector, KeywordDetector
+
+# Strong enough rule-layer scores that the LLM layer still decides the verdict
+MESSAGE = ("URGENT!!! your bank account blocked, send money immediately to 9876543210 "
+           "upi fraud@ybl click http://bit.ly/x")
+
+
+class FailingProviderCacheTest(unittest.TestCase):
+    """An unreachable provider (with fallback replies enabled) must not be cached"""
+    
+    def setUp(self):
+        self.assertTrue(config.llm.enable_fallback)
+        self.calls = 0
+        
+        def failing_call(system_prompt, user_prompt, max_tokens):
+            self.calls += 1
+            return LLMResponse(content="", success=False, error="Connection refused")
+        
+        async def afailing_call(system_prompt, user_prompt, max_tokens):
+            return failing_call(system_prompt, user_prompt, max_tokens)
+        
+        llm._call_ollama = failing_call
+        llm._acall_ollama = afailing_call
+        self.addCleanup(vars(llm).pop, "_call_ollama")
+        self.addCleanup(vars(llm).pop, "_acall_ollama")
+        self.detector = ScamDetector()
+    
+    def test_fallback_result_is_not_cached(self):
+        result = self.detector.detect(MESSAGE)
+        
+        self.assertTrue(result.llm_used_fallback)
+        self.assertFalse(result.llm_parsed)
+        self.assertEqual(self.detector._result_cache, {})
+        
+        self.detector.detect(MESSAGE)
+        self.assertEqual(self.calls, 2)
+    
+    def test_async_fallback_result_is_not_cached(self):
+        result = asyncio.run(self.detector.adetect(MESSAGE))
+        
+        self.assertTrue(result.llm_used_fallback)
+        self.assertEqual(self.detector._result_cache, {})
+    
+    def test_parsed_result_is_cached(self):
+        def working_call(system_prompt, user_prompt, max_tokens):
+            self.calls += 1
+            return LLMResponse(
+                content='{"is_scam": true, "confidence": 0.9, "scam_type": "banking_fraud", "reasoning": "r"}',
+                success=True
+            )
+        
+        llm._call_ollama = working_call
+        self.detector.detect(MESSAGE)
+        self.detector.detect(MESSAGE)
+        
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(self.detector._result_cache), 1)
+
+
+
+class NonObjectDetectionTest(unittest.TestCase):
+    """Valid JSON that isn't an object gets the conservative fallback result"""
+    
+    def test_non_object_json_is_not_parsed(self):
+        for content in ('["scam"]', '"scam"', '42', 'null'):
+            with self.subTest(content=content):
+                result = llm._tag_detection(LLMResponse(content=content, success=True))[0]
+                
+                self.assertFalse(result["parsed"])
+                self.assertEqual(result["confidence"], 0.5)
+                self.assertEqual(result["reasoning"], content)
+    
+    def test_detector_survives_non_object_json(self):
+        llm._call_ollama = lambda system_prompt, user_prompt, max_tokens: LLMResponse(
+            content='["scam"]', success=True
+        )
+        self.addCleanup(vars(llm).pop, "_call_ollama")
+        
+        result = ScamDetector().detect(MESSAGE + " list reply")
+        self.assertFalse(result.llm_parsed)
+
+
+
+class KeywordBoundaryTest(unittest.TestCase):
+    """Keywords count at a word start or after a digit, not inside a word"""
+    
+    def test_keyword_inside_word_is_ignored(self):
+        self.assertNotIn("bank", KeywordDetector._matched_keywords("walk along the embankment"))
+    
+    def test_keyword_glued_to_amount_counts(self):
+        self.assertIn("lakh", KeywordDetector._matched_keywords("pay 5lakh now to unlock"))
+        self.assertEqual(KeywordDetector.detect("Pay 5lakh now to unlock")["score"],
+                         KeywordDetector.detect("Pay 5 lakh now to unlock")["score"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,46 +5,64 @@ Provides logging, data normalization, and helper functions
 
 import re
 import json
+import queue
+import atexit
 import logging
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import logging.handlers
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from config import config
 
 
 class PIIMasker:
     """Masks personally identifiable information in logs"""
     
+    # Compiled once; every log line goes through mask_all
+    _PHONE_RE = re.compile(r'(\+?\d{1,3}[-.\s]?)(\d{3,5})([-.\s]?\d{4,10})')
+    _EMAIL_RE = re.compile(r'([a-zA-Z0-9._%+-])[a-zA-Z0-9._%+-]*@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+    _BANK_ACCOUNT_RE = re.compile(r'\b(\d{4})\d+(\d{3})\b')
+    _UPI_RE = re.compile(r'([a-zA-Z0-9])[a-zA-Z0-9._-]*@([a-zA-Z0-9.-]+)')
+    _DIGIT_RE = re.compile(r'\d')
+    _PII_TRIGGER_RE = re.compile(r'[\d@]')
+    
     @staticmethod
     def mask_phone(text: str) -> str:
         """Mask phone numbers: +91-9876543210 -> +91-98765*****"""
-        pattern = r'(\+?\d{1,3}[-.\s]?)(\d{3,5})([-.\s]?\d{4,10})'
-        return re.sub(pattern, r'\1\2*****', text)
+        return PIIMasker._PHONE_RE.sub(r'\1\2*****', text)
     
     @staticmethod
     def mask_email(text: str) -> str:
         """Mask emails: test@example.com -> t***@example.com"""
-        pattern = r'([a-zA-Z0-9._%+-])[a-zA-Z0-9._%+-]*@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-        return re.sub(pattern, r'\1***@\2', text)
+        return PIIMasker._EMAIL_RE.sub(r'\1***@\2', text)
     
     @staticmethod
     def mask_bank_account(text: str) -> str:
         """Mask bank accounts: 1234567890 -> 1234***890"""
-        pattern = r'\b(\d{4})\d+(\d{3})\b'
-        return re.sub(pattern, r'\1***\2', text)
+        return PIIMasker._BANK_ACCOUNT_RE.sub(r'\1***\2', text)
     
     @staticmethod
     def mask_upi(text: str) -> str:
         """Mask UPI IDs: user@upi -> u***@upi"""
-        pattern = r'([a-zA-Z0-9])[a-zA-Z0-9._-]*@([a-zA-Z0-9.-]+)'
-        return re.sub(pattern, r'\1***@\2', text)
+        return PIIMasker._UPI_RE.sub(r'\1***@\2', text)
     
     @staticmethod
     def mask_all(text: str) -> str:
         """Apply all masking rules"""
-        text = PIIMasker.mask_phone(text)
-        text = PIIMasker.mask_email(text)
-        text = PIIMasker.mask_bank_account(text)
-        text = PIIMasker.mask_upi(text)
+        if not PIIMasker._PII_TRIGGER_RE.search(text):
+            return text
+        
+        # Phone/bank rules need a digit, email/UPI rules need an '@', and
+        # masking never adds either, so run only the passes that can match
+        has_digit = PIIMasker._DIGIT_RE.search(text) is not None
+        has_at = '@' in text
+        if has_digit:
+            text = PIIMasker.mask_phone(text)
+        if has_at:
+            text = PIIMasker.mask_email(text)
+        if has_digit:
+            text = PIIMasker.mask_bank_account(text)
+        if has_at:
+            text = PIIMasker.mask_upi(text)
         return text
 
 
@@ -54,6 +72,7 @@ class HoneypotLogger:
     def __init__(self, name: str):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(getattr(logging, config.logging.log_level))
+        handlers = []
         
         # Console handler
         console_handler = logging.StreamHandler()
@@ -62,7 +81,7 @@ class HoneypotLogger:
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         console_handler.setFormatter(console_format)
-        self.logger.addHandler(console_handler)
+        handlers.append(console_handler)
         
         # File handler
         if config.logging.log_to_file:
@@ -72,7 +91,15 @@ class HoneypotLogger:
                 '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
             )
             file_handler.setFormatter(file_format)
-            self.logger.addHandler(file_handler)
+            handlers.append(file_handler)
+        
+        # Callers only enqueue records; a listener thread does the console and
+        # disk writes (each handler still filters by its own level)
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self._listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self._listener.stop)
     
     def _mask_if_enabled(self, message: str) -> str:
         """Mask PII if enabled in config"""
@@ -80,36 +107,56 @@ class HoneypotLogger:
             return PIIMasker.mask_all(message)
         return message
     
+    # Check the level first so suppressed messages are never masked
     def debug(self, message: str):
-        self.logger.debug(self._mask_if_enabled(message))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(self._mask_if_enabled(message))
     
     def info(self, message: str):
-        self.logger.info(self._mask_if_enabled(message))
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(self._mask_if_enabled(message))
     
     def warning(self, message: str):
-        self.logger.warning(self._mask_if_enabled(message))
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(self._mask_if_enabled(message))
     
     def error(self, message: str):
-        self.logger.error(self._mask_if_enabled(message))
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(self._mask_if_enabled(message))
     
     def critical(self, message: str):
-        self.logger.critical(self._mask_if_enabled(message))
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self.logger.critical(self._mask_if_enabled(message))
 
 
 class DataNormalizer:
     """Normalizes extracted data for consistency"""
     
+    # Compiled once; called for every extracted phone/bank entity
+    _PHONE_STRIP = re.compile(r'[^\d+]')
+    _SEPARATOR_STRIP = re.compile(r'[\s\-]')
+    _NON_DIGIT = re.compile(r'\D')
+    
+    # First six digits of an ascending run (1234567890, 0123456789, ...)
+    _SEQUENTIAL_PREFIXES = frozenset({'012345', '123456', '234567', '345678', '456789'})
+    _TEST_KEYWORDS = ('test', 'dummy', 'fake', 'example', '000000', '999999')
+    
     @staticmethod
     def normalize_phone(phone: str) -> str:
         """Remove spaces, dashes, parentheses from phone numbers"""
+        # Already bare digits (str.isdecimal() is exactly the regex \d class)
+        if phone.isdecimal():
+            return phone
         # Remove all non-digit characters except leading +
-        normalized = re.sub(r'[^\d+]', '', phone)
+        normalized = DataNormalizer._PHONE_STRIP.sub('', phone)
         return normalized
     
     @staticmethod
     def normalize_bank_account(account: str) -> str:
         """Remove spaces and dashes from bank account numbers"""
-        return re.sub(r'[\s\-]', '', account)
+        if account.isdecimal():
+            return account
+        return DataNormalizer._SEPARATOR_STRIP.sub('', account)
     
     @staticmethod
     def normalize_upi(upi: str) -> str:
@@ -133,35 +180,84 @@ class DataNormalizer:
         # Check for sequential or repeated digits
         if entity_type in ['bank_account', 'phone']:
             # Remove non-digits
-            digits = re.sub(r'\D', '', value)
+            digits = DataNormalizer._NON_DIGIT.sub('', value)
             
             # Check for sequential: 1234567890
-            if len(digits) >= 6:
-                is_sequential = all(
-                    int(digits[i]) == int(digits[i-1]) + 1 
-                    for i in range(1, min(6, len(digits)))
-                )
-                if is_sequential:
-                    return True
+            if digits[:6] in DataNormalizer._SEQUENTIAL_PREFIXES:
+                return True
             
             # Check for repeated: 1111111111
             if len(set(digits)) <= 2:
                 return True
         
         # Check for test/dummy keywords
-        test_keywords = ['test', 'dummy', 'fake', 'example', '000000', '999999']
         value_lower = value.lower()
-        if any(keyword in value_lower for keyword in test_keywords):
+        if any(keyword in value_lower for keyword in DataNormalizer._TEST_KEYWORDS):
             return True
         
         return False
 
 
+class KeywordMatcher:
+    """
+    Finds which of a fixed set of keywords occur in a text (and where), in one pass
+    
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    falls back to one substring check per keyword (same results, slower).
+    Keywords are casefolded at build time; callers pass casefolded text.
+    """
+    
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(dict.fromkeys(keyword.casefold() for keyword in keywords))
+        self._automaton = None
+        if not self.keywords:
+            return
+        
+        try:
+            import ahocorasick
+        except ImportError:
+            return
+        
+        automaton = ahocorasick.Automaton()
+        for keyword in self.keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        self._automaton = automaton
+    
+    def find_all(self, text: str) -> Set[str]:
+        """Return the set of keywords that occur in text"""
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+        return {keyword for keyword in self.keywords if keyword in text}
+    
+    def find_positions(self, text: str) -> List[Tuple[int, str]]:
+        """Return (start offset, keyword) for every occurrence in text, overlaps included"""
+        if self._automaton is not None:
+            return [(end - len(keyword) + 1, keyword) for end, keyword in self._automaton.iter(text)]
+        
+        positions = []
+        for keyword in self.keywords:
+            start = text.find(keyword)
+            while start != -1:
+                positions.append((start, keyword))
+                start = text.find(keyword, start + 1)
+        return positions
+
+
 def get_timestamp() -> str:
     """Get current timestamp in ISO format"""
     return datetime.utcnow().isoformat() + 'Z'
 
 
+# Naive UTC epoch, matching the naive utcnow() values get_timestamp() formats
+_EPOCH = datetime(1970, 1, 1)
+
+
+def format_timestamp_ns(timestamp_ns: int) -> str:
+    """Format a time.time_ns() value in the same ISO format as get_timestamp()"""
+    return (_EPOCH + timedelta(microseconds=timestamp_ns // 1000)).isoformat() + 'Z'
+
+
 def safe_json_dumps(data: Any, indent: int = 2) -> str:
     """Safely serialize data to JSON"""
     try:
@@ -177,10 +273,12 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     return text[:max_length-3] + "..."
 
 
+_DOMAIN_RE = re.compile(r'(?:https?://)?(?:www\.)?([^/]+)')
+
+
 def extract_domain(url: str) -> Optional[str]:
     """Extract domain from URL"""
-    pattern = r'(?:https?://)?(?:www\.)?([^/]+)'
-    match = re.search(pattern, url)
+    match = _DOMAIN_RE.search(url)
     return match.group(1) if match else None
 
 